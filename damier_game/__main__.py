@@ -1,8 +1,10 @@
-import tkinter as tk
-from .damier import Damier
-from .board_ui import BoardUI
+import sys
+
 
 def display():
+    import tkinter as tk
+    from .board_ui import BoardUI
+
     root = tk.Tk()
     root.title("Dames")
 
@@ -13,4 +15,10 @@ def display():
     # root.resizable(0,0)
     root.mainloop()
 
-display()
+
+# avec des arguments, on utilise l'interface en ligne de commande (sans tkinter)
+if len(sys.argv) > 1:
+    from .command_line import main
+    sys.exit(main())
+else:
+    display()
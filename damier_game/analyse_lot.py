@@ -0,0 +1,230 @@
+"""
+Analyse vectorisée d'un lot de situations de jeu avec NumPy (dépendance
+optionnelle, importée seulement par ce module).
+"""
+import numpy
+
+from .codec_position import CodecPosition
+from .constants import Couleur, Direction
+from .position_damier import PositionsDamier
+
+
+def _construireTables():
+    """
+    Construit, à partir de PositionsDamier, les tableaux d'indices des cases
+    voisines et des rayons. Les indices commencent à 0 (case 1); l'indice 50
+    représente l'extérieur du damier, jamais libre ni occupé par une pièce.
+    """
+    nombre = PositionsDamier.getNombrePositions()
+    voisines = numpy.full((len(Direction.all), nombre + 1), nombre, dtype=numpy.intp)
+    rayons = numpy.full((len(Direction.all), nombre + 1, PositionsDamier.lignes - 1), nombre,
+                        dtype=numpy.intp)
+    for (d, direction) in enumerate(Direction.all):
+        for position in range(1, nombre + 1):
+            voisine = PositionsDamier.voisines[direction][position]
+            if voisine > 0:
+                voisines[d, position - 1] = voisine - 1
+            for (k, case) in enumerate(PositionsDamier.rayons[direction][position]):
+                rayons[d, position - 1, k] = case - 1
+    return (voisines, rayons)
+
+
+(_voisines, _rayons) = _construireTables()
+_exterieur = PositionsDamier.getNombrePositions()
+_distances = numpy.arange(PositionsDamier.lignes - 1)
+""" indices des directions d'avancement des pions, par trait (0 blanc, 1 noir) """
+_avancement = [[Direction.all.index(direction) for direction in Direction.avancement[couleur]]
+               for couleur in (Couleur.BLANC, Couleur.NOIR)]
+
+
+class ResultatLot:
+    """
+    Résultat de l'analyse d'un lot de situations de jeu: un tableau par
+    information, une ligne par situation
+    """
+
+    def __init__(self, nombreCoups, prises, priseMax):
+        """
+        @param nombreCoups
+        nombre de coups possibles, sans doublons (comme Damier.legalMoves)
+        @param prises
+        true si la prise est obligatoire
+        @param priseMax
+        nombre de pièces prises par les coups possibles (0 sans prise)
+        """
+        self.nombreCoups = nombreCoups
+        self.prises = prises
+        self.priseMax = priseMax
+
+
+class AnalyseLot:
+    """
+    Calcule, sans boucle Python par situation de jeu, le nombre de coups
+    possibles, l'obligation de prise et la prise maximale d'un lot de
+    situations de jeu. Les situations sont données par un tableau (N, 50)
+    d'états de cases (voir CodecPosition) et le trait par un tableau (N,)
+    (0 blanc, 1 noir, comme dans dataset.DatasetPositions).
+
+    Les prises sont explorées en largeur: chaque ligne de la "frontière" est
+    une prise en cours (situation, case de la pièce, case de départ, pièces
+    déjà prises) et chaque itération prolonge toutes les prises d'une pièce,
+    direction par direction. Les règles sont celles de Damier.analyse: les
+    pièces prises restent sur le damier jusqu'à la fin du coup et un pion qui
+    traverse la dernière ligne pendant une prise reste un pion.
+    """
+
+    @staticmethod
+    def depuisDataset(enregistrements):
+        """
+        Obtient les situations de jeu d'enregistrements d'un fichier de positions
+
+        @param enregistrements
+        tableau structuré renvoyé par dataset.DatasetPositions.lire
+        @return le couple (plateaux (N, 50) int8, traits (N,))
+        """
+        (plateaux, traits) = CodecPosition.decoderTableau(enregistrements["plateau"])
+        return (plateaux, numpy.asarray(enregistrements["trait"]))
+
+    @staticmethod
+    def analyser(plateaux, traits=None):
+        """
+        Analyse un lot de situations de jeu
+
+        @param plateaux
+        tableau (N, 50) des états des cases
+        @param traits
+        tableau (N,) du trait (0 blanc, 1 noir), blanc par défaut
+        @return un ResultatLot
+        """
+        plateaux = numpy.asarray(plateaux, dtype=numpy.int8)
+        nombre = plateaux.shape[0]
+        if traits is None:
+            traits = numpy.zeros(nombre, dtype=bool)
+        else:
+            traits = numpy.asarray(traits).astype(bool)
+        noirs = traits[:, None]
+
+        # une colonne supplémentaire (l'extérieur du damier) ni libre ni occupée
+        exterieur = numpy.zeros((nombre, 1), dtype=bool)
+        blancs = (plateaux == CodecPosition.PION_BLANC) | (plateaux == CodecPosition.DAME_BLANCHE)
+        noirsPieces = (plateaux == CodecPosition.PION_NOIR) | (plateaux == CodecPosition.DAME_NOIRE)
+        vides = numpy.hstack([plateaux == CodecPosition.VIDE, exterieur])
+        adverses = numpy.hstack([numpy.where(noirs, blancs, noirsPieces), exterieur])
+        pions = numpy.where(noirs, plateaux == CodecPosition.PION_NOIR,
+                            plateaux == CodecPosition.PION_BLANC)
+        dames = numpy.where(noirs, plateaux == CodecPosition.DAME_NOIRE,
+                            plateaux == CodecPosition.DAME_BLANCHE)
+
+        (priseMax, nombrePrises) = AnalyseLot._analyserPrises(pions, dames, vides, adverses)
+
+        # sans prise, un pion avance d'une case et une dame glisse sur les
+        # cases libres de ses diagonales
+        deplacements = numpy.zeros(nombre, dtype=numpy.int64)
+        for trait in (0, 1):
+            pionsTrait = pions & (noirs if trait else ~noirs)
+            for d in _avancement[trait]:
+                deplacements += (pionsTrait & vides[:, _voisines[d, :_exterieur]]).sum(axis=1)
+        for d in range(len(Direction.all)):
+            libres = numpy.cumprod(vides[:, _rayons[d, :_exterieur]], axis=2).sum(axis=2)
+            deplacements += (libres * dames).sum(axis=1)
+
+        prises = priseMax > 0
+        return ResultatLot(numpy.where(prises, nombrePrises, deplacements), prises, priseMax)
+
+    @staticmethod
+    def _analyserPrises(pions, dames, vides, adverses):
+        """
+        @return les tableaux (N,) de la prise maximale et du nombre de coups
+        de prise maximale
+        """
+        nombre = pions.shape[0]
+        priseMax = numpy.zeros(nombre, dtype=numpy.int64)
+        nombrePrises = numpy.zeros(nombre, dtype=numpy.int64)
+
+        (lots, cases) = numpy.nonzero(pions | dames)
+        estDame = dames[lots, cases]
+        origines = cases
+        capturees = numpy.zeros(len(lots), dtype=numpy.uint64)
+        longueur = 0
+        while len(lots) > 0:
+            precedents = (lots, cases, origines, capturees)
+            enfants = [[] for i in range(6)]
+            for d in range(len(Direction.all)):
+                AnalyseLot._prolongerPions(d, lots, cases, estDame, origines, capturees,
+                                           vides, adverses, enfants)
+                AnalyseLot._prolongerDames(d, lots, cases, estDame, origines, capturees,
+                                           vides, adverses, enfants)
+            (parents, lots, cases, estDame, origines, capturees) = \
+                [numpy.concatenate(colonne) for colonne in enfants]
+
+            # les prises qui ne se prolongent pas sont terminées; elles sont
+            # plus longues que toutes celles des itérations précédentes
+            if longueur > 0:
+                terminees = numpy.bincount(parents, minlength=len(precedents[0])) == 0
+                (lotsTermines, arrivees, departs, captureesTerminees) = \
+                    [colonne[terminees] for colonne in precedents]
+                # les prises de mêmes départ, arrivée et pièces prises sont un
+                # seul coup (Damier.legalMoves)
+                coups = numpy.unique(numpy.stack([
+                    ((lotsTermines * (_exterieur + 1) + departs) * (_exterieur + 1) + arrivees)
+                    .astype(numpy.uint64), captureesTerminees], axis=1), axis=0)
+                lotsCoups = (coups[:, 0] // numpy.uint64((_exterieur + 1) ** 2)).astype(numpy.intp)
+                compte = numpy.bincount(lotsCoups, minlength=nombre)
+                trouvees = compte > 0
+                priseMax[trouvees] = longueur
+                nombrePrises[trouvees] = compte[trouvees]
+            longueur = longueur + 1
+        return (priseMax, nombrePrises)
+
+    @staticmethod
+    def _prolongerPions(d, lots, cases, estDame, origines, capturees, vides, adverses, enfants):
+        """
+        Prolonge d'une prise dans la direction d les prises des pions
+        """
+        indices = numpy.nonzero(~estDame)[0]
+        lots = lots[indices]
+        capturee = _voisines[d, cases[indices]]
+        arrivee = _voisines[d, capturee]
+        valides = adverses[lots, capturee] & ~AnalyseLot._estCapturee(capturees[indices], capturee) \
+            & (vides[lots, arrivee] | (arrivee == origines[indices]))
+        indices = indices[valides]
+        AnalyseLot._ajouterEnfants(enfants, indices, lots[valides], arrivee[valides], False,
+                                   origines, capturees, capturee[valides])
+
+    @staticmethod
+    def _prolongerDames(d, lots, cases, estDame, origines, capturees, vides, adverses, enfants):
+        """
+        Prolonge d'une prise dans la direction d les prises des dames: la
+        première case occupée du rayon doit être une pièce adverse non prise,
+        la dame s'arrête sur une des cases libres qui la suivent
+        """
+        indices = numpy.nonzero(estDame)[0]
+        lots = lots[indices]
+        rayons = _rayons[d, cases[indices]]
+        libres = vides[lots[:, None], rayons] | (rayons == origines[indices][:, None])
+        occupees = ~libres
+        premiere = occupees.argmax(axis=1)
+        capturee = rayons[numpy.arange(len(indices)), premiere]
+        valides = occupees.any(axis=1) & adverses[lots, capturee] \
+            & ~AnalyseLot._estCapturee(capturees[indices], capturee)
+        # cases libres consécutives après la pièce prise
+        apres = _distances > premiere[:, None]
+        arrivees = numpy.cumprod(libres | ~apres, axis=1).astype(bool) & apres & valides[:, None]
+        (lignes, distances) = numpy.nonzero(arrivees)
+        AnalyseLot._ajouterEnfants(enfants, indices[lignes], lots[lignes],
+                                   rayons[lignes, distances], True,
+                                   origines, capturees, capturee[lignes])
+
+    @staticmethod
+    def _estCapturee(capturees, cases):
+        return ((capturees >> cases.astype(numpy.uint64)) & numpy.uint64(1)).astype(bool)
+
+    @staticmethod
+    def _ajouterEnfants(enfants, parents, lots, cases, estDame, origines, capturees, capturee):
+        enfants[0].append(parents)
+        enfants[1].append(lots)
+        enfants[2].append(cases)
+        enfants[3].append(numpy.full(len(parents), estDame))
+        enfants[4].append(origines[parents])
+        enfants[5].append(capturees[parents] |
+                          (numpy.uint64(1) << capturee.astype(numpy.uint64)))
@@ -0,0 +1,625 @@
+"""
+Bases de finales: valeur exacte (gain, perte ou nulle, et éventuellement
+distance au gain) de toutes les situations de jeu d'une configuration de
+pièces (nombre de pions et de dames de chaque couleur), calculées une fois
+pour toutes par analyse rétrograde et lues par projection en mémoire.
+"""
+import argparse
+import bisect
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+from array import array
+
+from .constants import Couleur, TypePiece
+from .damier import Damier
+from .position_damier import PositionsDamier
+
+
+class ValeurFinale:
+    """ valeur d'une situation de jeu, du point de vue de la couleur qui a le trait """
+    NUL = 0
+    GAIN = 1
+    PERTE = 2
+    """ situation impossible (pion sur sa ligne de promotion) """
+    INVALIDE = 3
+
+
+class IndexFinales:
+    """
+    Fonction de hachage parfaite des situations de jeu d'une configuration:
+    chaque groupe de pièces (pions noirs, pions blancs, dames noires, dames
+    blanches, dans l'ordre de Damier.creerPieces) est numéroté par le système
+    combinatoire parmi les cases laissées libres par les groupes précédents,
+    puis le trait est ajouté (0 blanc, 1 noir). Les indices vont de 0 à
+    getNombre(configuration) - 1; les seuls indices inutilisés sont ceux des
+    situations où un pion est sur sa ligne de promotion.
+    """
+
+    """ nombre maximal de pièces d'une configuration """
+    piecesMax = 10
+
+    @staticmethod
+    def construireTables():
+        """
+        Construit la table des coefficients binomiaux C(n, k), pour n jusqu'au
+        nombre de positions et k jusqu'à piecesMax
+        """
+        nombrePositions = PositionsDamier.getNombrePositions()
+        binomiaux = []
+        for n in range(nombrePositions + 1):
+            ligne = [1] + [0] * IndexFinales.piecesMax
+            for k in range(1, IndexFinales.piecesMax + 1):
+                if n > 0:
+                    ligne[k] = binomiaux[n - 1][k - 1] + binomiaux[n - 1][k]
+            binomiaux.append(ligne)
+        IndexFinales.binomiaux = binomiaux
+
+    @staticmethod
+    def getConfiguration(groupes):
+        """
+        @param groupes
+        positions des pions noirs, pions blancs, dames noires, dames blanches
+        @return le nombre de pièces de chaque groupe
+        """
+        return tuple(len(groupe) for groupe in groupes)
+
+    @staticmethod
+    def getNombre(configuration):
+        """
+        @return le nombre d'indices de la configuration (les deux traits)
+        """
+        result = 2
+        libres = PositionsDamier.getNombrePositions()
+        for nombre in configuration:
+            result = result * IndexFinales.binomiaux[libres][nombre]
+            libres = libres - nombre
+        return result
+
+    @staticmethod
+    def indexer(groupes, trait):
+        """
+        @param groupes
+        positions triées des pions noirs, pions blancs, dames noires, dames
+        blanches
+        @param trait
+        couleur qui a le trait
+        @return l'indice de la situation de jeu dans sa configuration
+        """
+        binomiaux = IndexFinales.binomiaux
+        libres = PositionsDamier.getNombrePositions()
+        occupees = []
+        result = 0
+        for groupe in groupes:
+            rang = 0
+            for (k, position) in enumerate(groupe):
+                # numéro de la case parmi celles que les groupes précédents
+                # laissent libres
+                rang = rang + binomiaux[position - 1 - bisect.bisect(occupees, position)][k + 1]
+            result = result * binomiaux[libres][len(groupe)] + rang
+            libres = libres - len(groupe)
+            if len(groupe) > 0:
+                occupees = sorted(occupees + list(groupe))
+        return 2 * result + (1 if trait == Couleur.NOIR else 0)
+
+    @staticmethod
+    def desindexer(configuration, index):
+        """
+        @return le couple (groupes, trait) de la situation de jeu d'un indice
+        """
+        binomiaux = IndexFinales.binomiaux
+        nombrePositions = PositionsDamier.getNombrePositions()
+        trait = Couleur.NOIR if index & 1 else Couleur.BLANC
+        index = index >> 1
+        rangs = [0] * len(configuration)
+        libres = nombrePositions - sum(configuration)
+        for g in range(len(configuration) - 1, -1, -1):
+            libres = libres + configuration[g]
+            (index, rangs[g]) = divmod(index, binomiaux[libres][configuration[g]])
+
+        groupes = []
+        occupees = set()
+        for g in range(len(configuration)):
+            rang = rangs[g]
+            numeros = []
+            for k in range(configuration[g], 0, -1):
+                c = k - 1
+                while binomiaux[c + 1][k] <= rang:
+                    c = c + 1
+                rang = rang - binomiaux[c][k]
+                numeros.append(c)
+            casesLibres = [position for position in range(1, nombrePositions + 1)
+                           if position not in occupees]
+            groupe = [casesLibres[numero] for numero in reversed(numeros)]
+            occupees.update(groupe)
+            groupes.append(groupe)
+        return (groupes, trait)
+
+    @staticmethod
+    def estValide(groupes):
+        """
+        @return false si un pion est sur sa ligne de promotion
+        """
+        for (g, couleur) in ((0, Couleur.NOIR), (1, Couleur.BLANC)):
+            for position in groupes[g]:
+                if PositionsDamier.estLigneDeFond(position, couleur):
+                    return False
+        return True
+
+    @staticmethod
+    def jouer(groupes, coup):
+        """
+        Obtient les groupes de pièces qui suivent un coup, sans le jouer sur
+        un damier (la promotion a lieu à la fin du coup, comme Damier.make)
+
+        @param coup
+        un Coup de Damier.legalMoves
+        @return les positions triées des pions noirs, pions blancs, dames
+        noires, dames blanches après le coup
+        """
+        result = []
+        deplace = -1
+        for (g, groupe) in enumerate(groupes):
+            suivant = []
+            for position in groupe:
+                if position == coup.depart:
+                    deplace = g
+                elif not (coup.captures >> (position - 1)) & 1:
+                    suivant.append(position)
+            result.append(suivant)
+        if coup.promotion:
+            deplace = deplace + 2
+        bisect.insort(result[deplace], coup.arrivee)
+        return result
+
+    @staticmethod
+    def getGroupes(damier):
+        """
+        @return les positions triées des pions noirs, pions blancs, dames
+        noires, dames blanches d'un damier
+        """
+        groupes = [[], [], [], []]
+        for piece in damier.pieces:
+            g = 0 if piece.couleur == Couleur.NOIR else 1
+            if piece.typePiece == TypePiece.DAME:
+                g = g + 2
+            groupes[g].append(piece.position)
+        for groupe in groupes:
+            groupe.sort()
+        return groupes
+
+
+IndexFinales.construireTables()
+
+
+class BaseFinales:
+    """
+    Répertoire de bases de finales, un fichier par configuration, projeté en
+    mémoire à la première consultation. Un fichier commence par un en-tête
+    de 28 octets (signature, version, nombre de pièces de chaque groupe,
+    présence des distances, nombre d'indices), suivi de:
+
+        valeurs    2 bits par indice (ValeurFinale), 4 indices par octet
+        distances  1 octet par indice, si présentes: nombre de demi-coups
+                   jusqu'à la fin de la partie pour une situation gagnée ou
+                   perdue (255 au-delà)
+    """
+
+    signature = b"DAMIERBF"
+    version = 1
+    _entete = struct.Struct("<8sI4BBxxx")
+    tailleEntete = _entete.size + 8
+    distanceMax = 255
+
+    @staticmethod
+    def getNomFichier(configuration):
+        """
+        @param configuration
+        nombre de pions noirs, pions blancs, dames noires, dames blanches
+        """
+        return "finale_{:d}{:d}{:d}{:d}.bin".format(*configuration)
+
+    def __init__(self, repertoire):
+        """
+        @param repertoire
+        répertoire des fichiers de bases de finales
+        """
+        self.repertoire = repertoire
+        self._fichiers = {}
+        self.piecesMax = 0
+        if os.path.isdir(repertoire):
+            for nom in os.listdir(repertoire):
+                if nom.startswith("finale_") and nom.endswith(".bin"):
+                    chiffres = nom[len("finale_"):-len(".bin")]
+                    if len(chiffres) == 4 and chiffres.isdigit():
+                        self.piecesMax = max(self.piecesMax, sum(int(c) for c in chiffres))
+        self.reinitialiserStatistiques()
+
+    def reinitialiserStatistiques(self):
+        self.sondages = 0
+        self.succes = 0
+
+    def fermer(self):
+        for fichier in self._fichiers.values():
+            if fichier is not None:
+                fichier[0].close()
+        self._fichiers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def getFichier(self, configuration):
+        """
+        @return le triplet (projection en mémoire, nombre d'indices, distances
+        présentes) ou None si la base de la configuration n'existe pas
+        """
+        if configuration in self._fichiers:
+            return self._fichiers[configuration]
+        result = None
+        nomFichier = os.path.join(self.repertoire, BaseFinales.getNomFichier(configuration))
+        if os.path.exists(nomFichier):
+            with open(nomFichier, "rb") as fichier:
+                donnees = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+            (signature, version, *nombres, avecDistances) = BaseFinales._entete.unpack_from(donnees)
+            (nombre,) = struct.unpack_from("<Q", donnees, BaseFinales._entete.size)
+            if signature != BaseFinales.signature or version != BaseFinales.version \
+                    or tuple(nombres) != tuple(configuration):
+                donnees.close()
+                raise ValueError("Format de base de finales inconnu: " + nomFichier)
+            result = (donnees, nombre, avecDistances != 0)
+        self._fichiers[configuration] = result
+        return result
+
+    def sonder(self, damier):
+        """
+        Cherche la valeur de la situation de jeu d'un damier
+
+        @return le couple (ValeurFinale, distance ou None si la base n'a pas
+        de distances), ou None si la configuration n'a pas de base
+        """
+        if len(damier.pieces) > self.piecesMax:
+            return None
+        return self.sonderGroupes(IndexFinales.getGroupes(damier), damier.prochainMouvement)
+
+    def sonderGroupes(self, groupes, trait):
+        """
+        @param groupes
+        positions triées des pions noirs, pions blancs, dames noires, dames
+        blanches
+        @param trait
+        couleur qui a le trait
+        """
+        self.sondages = self.sondages + 1
+        fichier = self.getFichier(IndexFinales.getConfiguration(groupes))
+        if fichier is None:
+            return None
+        (donnees, nombre, avecDistances) = fichier
+        index = IndexFinales.indexer(groupes, trait)
+        valeur = (donnees[BaseFinales.tailleEntete + (index >> 2)] >> ((index & 3) * 2)) & 3
+        distance = None
+        if avecDistances:
+            distance = donnees[BaseFinales.tailleEntete + (nombre + 3) // 4 + index]
+        self.succes = self.succes + 1
+        return (valeur, distance)
+
+    @staticmethod
+    def ecrire(nomFichier, configuration, valeurs, distances=None):
+        """
+        Écrit la base d'une configuration
+
+        @param valeurs
+        ValeurFinale par indice
+        @param distances
+        distance par indice (None: sans distances)
+        """
+        nombre = len(valeurs)
+        paquets = bytearray((nombre + 3) // 4)
+        for index in range(nombre):
+            paquets[index >> 2] |= valeurs[index] << ((index & 3) * 2)
+        with open(nomFichier, "wb") as fichier:
+            fichier.write(BaseFinales._entete.pack(
+                BaseFinales.signature, BaseFinales.version, *configuration,
+                1 if distances is not None else 0))
+            fichier.write(struct.pack("<Q", nombre))
+            fichier.write(paquets)
+            if distances is not None:
+                fichier.write(bytes(min(distance, BaseFinales.distanceMax) for distance in distances))
+
+
+""" base propre à chaque processus de calcul: (répertoire, configuration, base) """
+_baseProcessus = None
+
+
+def _analyserPositions(tache):
+    """
+    Analyse, dans un processus de calcul, les successeurs d'une tranche
+    d'indices d'une configuration avec le générateur de coups du damier. Les
+    successeurs d'une autre configuration (après une prise ou une promotion)
+    sont lus dans leur base, déjà générée.
+
+    @param tache
+    tuple (répertoire, configuration, premier indice, indice de fin)
+    @return une liste, par indice: None pour une situation invalide, sinon le
+    tuple (indices des successeurs de la même configuration, distance du gain
+    par un successeur d'une autre configuration ou -1, true si un successeur
+    d'une autre configuration est nul, plus grande distance de perte par les
+    successeurs gagnants d'une autre configuration)
+    """
+    global _baseProcessus
+    (repertoire, configuration, debut, fin) = tache
+    if _baseProcessus is None or _baseProcessus[:2] != (repertoire, configuration):
+        if _baseProcessus is not None:
+            _baseProcessus[2].fermer()
+        _baseProcessus = (repertoire, configuration, BaseFinales(repertoire))
+    base = _baseProcessus[2]
+
+    result = []
+    for index in range(debut, fin):
+        (groupes, trait) = IndexFinales.desindexer(configuration, index)
+        if not IndexFinales.estValide(groupes):
+            result.append(None)
+            continue
+        damier = Damier(True, trait)
+        damier.creerPieces(groupes)
+        successeurs = []
+        distanceGain = -1
+        nulExterne = False
+        distancePerte = 0
+        traitSuivant = Couleur.autre(trait)
+        for coup in damier.legalMoves():
+            groupesSuivants = IndexFinales.jouer(groupes, coup)
+            if IndexFinales.getConfiguration(groupesSuivants) == configuration:
+                successeurs.append(IndexFinales.indexer(groupesSuivants, traitSuivant))
+                continue
+            g = 0 if traitSuivant == Couleur.NOIR else 1
+            if len(groupesSuivants[g]) + len(groupesSuivants[g + 2]) == 0:
+                # l'adversaire n'a plus de pièce: il a perdu
+                (valeur, distance) = (ValeurFinale.PERTE, 0)
+            else:
+                resultat = base.sonderGroupes(groupesSuivants, traitSuivant)
+                if resultat is None:
+                    raise ValueError("Base de finales manquante: " + BaseFinales.getNomFichier(
+                        IndexFinales.getConfiguration(groupesSuivants)))
+                (valeur, distance) = resultat
+                if distance is None:
+                    distance = 0
+            if valeur == ValeurFinale.PERTE:
+                if distanceGain < 0 or distance + 1 < distanceGain:
+                    distanceGain = distance + 1
+            elif valeur == ValeurFinale.GAIN:
+                distancePerte = max(distancePerte, distance + 1)
+            else:
+                nulExterne = True
+        result.append((successeurs, distanceGain, nulExterne, distancePerte))
+    return result
+
+
+class GenerateurFinales:
+    """
+    Génère les bases de finales par analyse rétrograde. Les coups de chaque
+    situation de jeu sont calculés une fois par Damier.legalMoves (Pion et
+    Dame); le graphe des coups entre situations d'une même configuration est
+    ensuite parcouru à rebours depuis les situations perdues (plus de coup
+    possible), par distance croissante:
+        - une situation dont un successeur est perdu est gagnée
+        - une situation dont tous les successeurs sont gagnés est perdue
+        - les situations qui restent sont nulles
+    Les configurations sont générées par nombre de pièces puis nombre de
+    pions croissants: les successeurs d'une autre configuration (après une
+    prise ou une promotion) sont ainsi déjà dans leur base.
+
+    Avec plusieurs processus, seule l'analyse des situations (les coups de
+    chaque situation, par tranches de "tailleTranche" indices) est répartie:
+    la construction du graphe des prédécesseurs et le parcours à rebours
+    restent dans le processus principal, qui n'utilise qu'un processeur
+    (quelques pour cent du calcul, pour une configuration de 3 pièces). Le
+    gain est borné par le nombre de processeurs disponibles: sur un seul
+    processeur, plusieurs processus n'accélèrent pas la génération.
+    """
+
+    """ nombre d'indices analysés par tâche """
+    tailleTranche = 2048
+
+    def __init__(self, repertoire, distances=False, processus=1):
+        """
+        @param repertoire
+        répertoire où écrire les bases
+        @param distances
+        true pour écrire les distances (exactes si les bases des
+        configurations plus petites ont aussi des distances)
+        @param processus
+        nombre de processus de calcul de l'analyse des situations (le
+        parcours à rebours est fait par le processus principal)
+        """
+        self.repertoire = repertoire
+        self.distances = distances
+        self.processus = processus
+
+    @staticmethod
+    def getConfigurations(piecesMax, damesSeulement=False):
+        """
+        @return les configurations d'au plus piecesMax pièces, avec au moins
+        une pièce de chaque couleur, dans l'ordre de génération
+        """
+        result = []
+        for total in range(2, piecesMax + 1):
+            for pionsNoirs in range(total + 1):
+                for pionsBlancs in range(total - pionsNoirs + 1):
+                    for damesNoires in range(total - pionsNoirs - pionsBlancs + 1):
+                        damesBlanches = total - pionsNoirs - pionsBlancs - damesNoires
+                        if pionsNoirs + damesNoires == 0 or pionsBlancs + damesBlanches == 0:
+                            continue
+                        if damesSeulement and pionsNoirs + pionsBlancs > 0:
+                            continue
+                        result.append((pionsNoirs, pionsBlancs, damesNoires, damesBlanches))
+        result.sort(key=lambda configuration: (sum(configuration), configuration[0] + configuration[1]))
+        return result
+
+    def generer(self, piecesMax, damesSeulement=False, remplacer=False):
+        """
+        Génère les bases manquantes jusqu'à piecesMax pièces
+
+        @param damesSeulement
+        true pour ne générer que les finales de dames
+        @param remplacer
+        true pour générer aussi les bases existantes
+        @return la liste des couples (configuration, statistiques)
+        """
+        os.makedirs(self.repertoire, exist_ok=True)
+        result = []
+        pool = multiprocessing.Pool(self.processus) if self.processus > 1 else None
+        try:
+            for configuration in GenerateurFinales.getConfigurations(piecesMax, damesSeulement):
+                nomFichier = os.path.join(self.repertoire, BaseFinales.getNomFichier(configuration))
+                if os.path.exists(nomFichier) and not remplacer:
+                    continue
+                result.append((configuration, self.genererConfiguration(configuration, pool)))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return result
+
+    def genererConfiguration(self, configuration, pool=None):
+        """
+        Génère et écrit la base d'une configuration
+
+        @return les statistiques: nombre d'indices, de gains, de pertes, de
+        nulles, plus grande distance et durée
+        """
+        debut = time.monotonic()
+        nombre = IndexFinales.getNombre(configuration)
+        taches = [(self.repertoire, configuration, premier,
+                   min(premier + GenerateurFinales.tailleTranche, nombre))
+                  for premier in range(0, nombre, GenerateurFinales.tailleTranche)]
+        if pool is not None:
+            tranches = pool.imap(_analyserPositions, taches)
+        else:
+            tranches = map(_analyserPositions, taches)
+
+        valeurs = bytearray([ValeurFinale.NUL]) * nombre
+        distances = array('H', bytes(2 * nombre))
+        restants = array('H', bytes(2 * nombre))
+        distancesGain = array('h', bytes(2 * nombre))
+        distancesPerte = array('H', bytes(2 * nombre))
+        nulsExternes = bytearray(nombre)
+        # arcs du graphe (successeur, prédécesseur) dans la configuration
+        sources = array('I')
+        cibles = array('I')
+        index = 0
+        for tranche in tranches:
+            for analyse in tranche:
+                if analyse is None:
+                    valeurs[index] = ValeurFinale.INVALIDE
+                else:
+                    (successeurs, distancesGain[index], nulsExternes[index],
+                     distancesPerte[index]) = analyse
+                    restants[index] = len(successeurs)
+                    for successeur in successeurs:
+                        sources.append(successeur)
+                        cibles.append(index)
+                index = index + 1
+
+        # prédécesseurs de chaque situation, consécutifs
+        debuts = array('I', bytes(4 * (nombre + 1)))
+        for source in sources:
+            debuts[source + 1] += 1
+        for i in range(nombre):
+            debuts[i + 1] += debuts[i]
+        predecesseurs = array('I', bytes(4 * len(sources)))
+        positions = array('I', debuts)
+        for (source, cible) in zip(sources, cibles):
+            predecesseurs[positions[source]] = cible
+            positions[source] += 1
+        del sources, cibles, positions
+
+        # parcours à rebours par distance croissante: la première valeur
+        # retenue pour une situation est celle de plus courte distance
+        connues = bytearray(nombre)
+        niveaux = []
+
+        def ajouter(distance, index, valeur):
+            while len(niveaux) <= distance:
+                niveaux.append([])
+            niveaux[distance].append((index, valeur))
+
+        for index in range(nombre):
+            if valeurs[index] == ValeurFinale.INVALIDE:
+                continue
+            if distancesGain[index] >= 0:
+                ajouter(distancesGain[index], index, ValeurFinale.GAIN)
+            elif restants[index] == 0 and not nulsExternes[index]:
+                ajouter(distancesPerte[index], index, ValeurFinale.PERTE)
+
+        distance = 0
+        while distance < len(niveaux):
+            for (index, valeur) in niveaux[distance]:
+                if connues[index]:
+                    continue
+                connues[index] = 1
+                valeurs[index] = valeur
+                distances[index] = distance
+                for i in range(debuts[index], debuts[index + 1]):
+                    predecesseur = predecesseurs[i]
+                    if connues[predecesseur]:
+                        continue
+                    if valeur == ValeurFinale.PERTE:
+                        ajouter(distance + 1, predecesseur, ValeurFinale.GAIN)
+                    else:
+                        restants[predecesseur] -= 1
+                        if restants[predecesseur] == 0 and not nulsExternes[predecesseur] \
+                                and distancesGain[predecesseur] < 0:
+                            ajouter(max(distance + 1, distancesPerte[predecesseur]),
+                                    predecesseur, ValeurFinale.PERTE)
+            niveaux[distance] = None
+            distance = distance + 1
+
+        nomFichier = os.path.join(self.repertoire, BaseFinales.getNomFichier(configuration))
+        BaseFinales.ecrire(nomFichier, configuration, valeurs,
+                           distances if self.distances else None)
+        return {
+            "indices": nombre,
+            "gains": valeurs.count(ValeurFinale.GAIN),
+            "pertes": valeurs.count(ValeurFinale.PERTE),
+            "nulles": valeurs.count(ValeurFinale.NUL),
+            "distanceMax": max(distances) if nombre > 0 else 0,
+            "duree": round(time.monotonic() - debut, 3)
+        }
+
+
+def main(args=None):
+    """
+    Génère les bases de finales dans un répertoire
+    """
+    parser = argparse.ArgumentParser(
+        prog="damier_game.base_finales", description="Génère les bases de finales par analyse rétrograde")
+    parser.add_argument("repertoire", help="répertoire des bases de finales")
+    parser.add_argument("--pieces", type=int, default=3, help="nombre maximal de pièces")
+    parser.add_argument("--dames", action="store_true", help="seulement les finales de dames")
+    parser.add_argument("--distances", action="store_true",
+                        help="écrit aussi la distance au gain de chaque situation")
+    parser.add_argument("--remplacer", action="store_true", help="génère aussi les bases existantes")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="nombre de processus de calcul de l'analyse des situations (le parcours "
+                             "rétrograde est fait par un seul processus)")
+    options = parser.parse_args(args)
+
+    if options.pieces > IndexFinales.piecesMax:
+        parser.error("au plus {:d} pièces".format(IndexFinales.piecesMax))
+    generateur = GenerateurFinales(options.repertoire, options.distances, options.jobs)
+    for (configuration, statistiques) in generateur.generer(options.pieces, options.dames,
+                                                            options.remplacer):
+        print("{} indices {:d} gains {:d} pertes {:d} nulles {:d} distance max {:d} durée {:.3f}s".format(
+            BaseFinales.getNomFichier(configuration), statistiques["indices"], statistiques["gains"],
+            statistiques["pertes"], statistiques["nulles"], statistiques["distanceMax"],
+            statistiques["duree"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,249 @@
+from .constants import Couleur, Direction, TypePiece
+from .position_damier import PositionsDamier
+from .mouvement_unitaire import MouvementUnitaire
+
+
+def _construireDecalages():
+    """
+    Construit, à partir de la table des positions voisines de PositionsDamier,
+    les couples (décalage, masque des cases source) qui permettent de déplacer
+    un masque entier d'une case dans chaque direction.
+    """
+    decalages = {}
+    for direction in Direction.all:
+        masques = {}
+        for position in range(1, PositionsDamier.getNombrePositions() + 1):
+            voisine = PositionsDamier.voisines[direction][position]
+            if voisine > 0:
+                decalage = voisine - position
+                masques[decalage] = masques.get(
+                    decalage, 0) | (1 << (position - 1))
+        decalages[direction] = list(masques.items())
+    return decalages
+
+
+_voisines = PositionsDamier.voisines
+_decalages = _construireDecalages()
+
+_opposees = {
+    Direction.HAUT_GAUCHE: Direction.BAS_DROITE,
+    Direction.HAUT_DROITE: Direction.BAS_GAUCHE,
+    Direction.BAS_GAUCHE: Direction.HAUT_DROITE,
+    Direction.BAS_DROITE: Direction.HAUT_GAUCHE
+}
+
+
+class Bitboard:
+    """
+    La classe Bitboard représente une situation de jeu sous forme de masques de
+    50 bits (le bit n - 1 correspond à la case n en notation Manoury). C'est un
+    moteur d'analyse alternatif à la liste des pièces du Damier: il produit les
+    mêmes arbres de mouvements unitaires, mais les déplacements et les prises
+    des pions sont calculés par décalage de masques entiers.
+    """
+
+    toutesPositions = (1 << PositionsDamier.getNombrePositions()) - 1
+
+    @staticmethod
+    def decaler(masque, direction):
+        """
+        Déplace toutes les cases d'un masque d'une case dans une direction
+        donnée. Les cases qui sortiraient du damier sont perdues.
+
+        @param masque
+        masque des cases à déplacer
+        @param direction
+        direction du déplacement
+        @return le masque des cases voisines
+        """
+        result = 0
+        for decalage, masqueSource in _decalages[direction]:
+            if decalage > 0:
+                result |= (masque & masqueSource) << decalage
+            else:
+                result |= (masque & masqueSource) >> -decalage
+        return result
+
+    @staticmethod
+    def positions(masque):
+        """
+        Obtient les positions (notation Manoury) des bits d'un masque, dans
+        l'ordre croissant
+        """
+        result = []
+        while masque:
+            bit = masque & -masque
+            result.append(bit.bit_length())
+            masque ^= bit
+        return result
+
+    @staticmethod
+    def depuisDamier(damier):
+        """
+        Construit les masques à partir des pièces d'un damier
+
+        @param damier
+        le damier à convertir
+        @return le bitboard équivalent
+        """
+        masques = {}
+        for typePiece in TypePiece.all:
+            for couleur in Couleur.all:
+                masques[(typePiece, couleur)] = 0
+        for piece in damier.pieces:
+            masques[(piece.typePiece, piece.couleur)] |= 1 << (piece.position - 1)
+        return Bitboard(masques[(TypePiece.PION, Couleur.BLANC)],
+                        masques[(TypePiece.PION, Couleur.NOIR)],
+                        masques[(TypePiece.DAME, Couleur.BLANC)],
+                        masques[(TypePiece.DAME, Couleur.NOIR)])
+
+    def __init__(self, pionsBlancs=0, pionsNoirs=0, damesBlanches=0, damesNoires=0):
+        self.pionsBlancs = pionsBlancs
+        self.pionsNoirs = pionsNoirs
+        self.damesBlanches = damesBlanches
+        self.damesNoires = damesNoires
+
+    @property
+    def blancs(self):
+        return self.pionsBlancs | self.damesBlanches
+
+    @property
+    def noirs(self):
+        return self.pionsNoirs | self.damesNoires
+
+    @property
+    def vides(self):
+        return Bitboard.toutesPositions & ~(self.blancs | self.noirs)
+
+    def getPions(self, couleur):
+        if couleur == Couleur.BLANC:
+            return self.pionsBlancs
+        return self.pionsNoirs
+
+    def getDames(self, couleur):
+        if couleur == Couleur.BLANC:
+            return self.damesBlanches
+        return self.damesNoires
+
+    def analyse(self, couleur):
+        """
+        Analyse la situation de jeu pour déterminer la liste des mouvements
+        possibles de la couleur donnée
+
+        @param couleur
+        couleur à qui est le tour de jouer
+        @return liste de mouvements unitaires possibles, avec prise maximale
+        """
+        pions = self.getPions(couleur)
+        dames = self.getDames(couleur)
+        adverses = self.getPions(Couleur.autre(couleur)) | \
+            self.getDames(Couleur.autre(couleur))
+        vides = self.vides
+
+        # les pions qui ont au moins une prise sont trouvés par décalage:
+        # pièce adverse voisine puis case libre derrière elle
+        pionsPreneurs = 0
+        for direction in Direction.all:
+            arrivees = Bitboard.decaler(Bitboard.decaler(
+                pions, direction) & adverses, direction) & vides
+            opposee = _opposees[direction]
+            pionsPreneurs |= Bitboard.decaler(
+                Bitboard.decaler(arrivees, opposee), opposee)
+
+        # la plus longue prise de chaque pièce est d'abord calculée, sans
+        # créer de mouvements unitaires: seules les pièces qui ont la prise
+        # maximale produisent ensuite leurs coups
+        preneurs = []
+        longueurMax = 0
+        for (positions, estDame) in ((pionsPreneurs, False), (dames, True)):
+            for position in Bitboard.positions(positions):
+                videsPiece = vides | (1 << (position - 1))
+                etapes = {}
+                longueur = self.getPriseMax(position, estDame, adverses, videsPiece, etapes)
+                if longueur > 0 and longueur >= longueurMax:
+                    longueurMax = longueur
+                    preneurs.append((longueur, position, etapes))
+        if longueurMax > 0:
+            chemins = []
+            for (longueur, position, etapes) in preneurs:
+                if longueur == longueurMax:
+                    chemins.extend(MouvementUnitaire.genererChemins(position, etapes))
+            return MouvementUnitaire.depuisChemins(chemins)
+
+        result = []
+        # sans capture, un pion avance d'une case, vers une case libre
+        for direction in Direction.avancement[couleur]:
+            voisines = _voisines[_opposees[direction]]
+            arrivees = Bitboard.decaler(pions, direction) & vides
+            for arrivee in Bitboard.positions(arrivees):
+                result.append(MouvementUnitaire(
+                    voisines[arrivee], arrivee, -1))
+
+        # une dame avance d'une ou plusieurs cases libres sur une diagonale
+        for position in Bitboard.positions(dames):
+            for direction in Direction.all:
+                for arrivee in PositionsDamier.rayons[direction][position]:
+                    if not vides & (1 << (arrivee - 1)):
+                        break
+                    result.append(MouvementUnitaire(position, arrivee, -1))
+        return result
+
+    def getPriseMax(self, position, estDame, adverses, vides, etapes, capturees=0):
+        """
+        Calcule, par une recherche en profondeur qui ne crée pas de mouvements
+        unitaires, le nombre maximal de pièces que peut prendre une pièce. La
+        suite d'une prise ne dépend que de la position de la pièce et des
+        pièces déjà capturées: chaque étape n'est parcourue qu'une fois, et
+        seules les prises qui mènent à la prise maximale y sont gardées (voir
+        MouvementUnitaire.genererChemins).
+
+        @param position
+        position courante de la pièce
+        @param estDame
+        true si la pièce est une dame
+        @param adverses
+        masque des pièces adverses
+        @param vides
+        masque des cases libres (la case de départ de la pièce est libre)
+        @param etapes
+        dictionnaire complété par les étapes parcourues
+        @param capturees
+        masque des pièces déjà capturées, qui restent sur le damier jusqu'à la
+        fin du mouvement
+        @return le nombre maximal de pièces prises (0 si la pièce ne peut pas
+        prendre)
+        """
+        etape = (capturees << 6) | position
+        dejaParcourue = etapes.get(etape)
+        if dejaParcourue is not None:
+            return dejaParcourue[0]
+        result = 0
+        prisesMaximales = []
+        for direction in Direction.all:
+            voisines = _voisines[direction]
+            positionCapturee = voisines[position]
+            # une dame peut sauter une pièce éloignée sur sa diagonale
+            if estDame:
+                while positionCapturee > 0 and vides & (1 << (positionCapturee - 1)):
+                    positionCapturee = voisines[positionCapturee]
+            if positionCapturee <= 0:
+                continue
+            bitCapture = 1 << (positionCapturee - 1)
+            # la pièce doit être adverse et pas encore capturée
+            if not adverses & bitCapture or capturees & bitCapture:
+                continue
+            arrivee = voisines[positionCapturee]
+            while arrivee > 0 and vides & (1 << (arrivee - 1)):
+                longueur = 1 + self.getPriseMax(arrivee, estDame, adverses, vides, etapes,
+                                                capturees | bitCapture)
+                if longueur > result:
+                    result = longueur
+                    prisesMaximales = []
+                if longueur == result:
+                    prisesMaximales.append((arrivee, positionCapturee))
+                # un pion s'arrête juste derrière la pièce capturée
+                if not estDame:
+                    break
+                arrivee = voisines[arrivee]
+        etapes[etape] = (result, prisesMaximales)
+        return result
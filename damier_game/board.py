@@ -2,6 +2,7 @@ from .constants import Couleur
 from .position_damier import PositionsDamier
 from .damier import Damier
 from .mouvement import Mouvement
+from .coup import Coup
 from .damier_exception import DamierException
 from .mouvement_unitaire import MouvementUnitaire
 
@@ -22,6 +23,7 @@ class Board:
     @start.setter
     def start(self, value):
         self._trace = []
+        self._chemin = []
         self._start = value
         self._hints = []
         if value is None:
@@ -128,6 +130,7 @@ class Board:
                 if position == mu.positionDestination:
                     self._mouvementsUnitaires = mu.mouvementsSuivants
                     self._trace.append(position)
+                    self._chemin.append(mu)
                     if (self._mouvementsUnitaires is None) or len(self._mouvementsUnitaires) == 0:
                         self.move()
                     else:
@@ -135,19 +138,21 @@ class Board:
                         for mu in self._mouvementsUnitaires:
                             hints.append(mu.positionDestination)
                         self._hints = hints
+                    break
         self._boardUI.drawBoard(False)
 
     def nouveauJeu(self):
         self.damier = Damier()
     def move(self):
-        traceStr = []
-        for p in self._trace:
-            traceStr.append(str(p))
-        mvtStr = "-".join(traceStr)
+        # le chemin suivi vient de l'arbre des mouvements possibles du damier:
+        # le coup est seulement comparé aux coups possibles
+        piece = self._damier.getPiece(self._chemin[0].positionDepart)
+        coup = Coup.depuisChemin(self._chemin, piece)
         self._start = None
         self._trace = []
+        self._chemin = []
         self._hints = []
-        mvt = Mouvement(self._damier, mvtStr)
+        mvt = Mouvement.depuisCoup(self._damier, coup)
         try:
             mvt.valider()
             mvt.execute()
@@ -0,0 +1,245 @@
+from .constants import Couleur, TypePiece
+from .damier import Damier
+from .position_damier import PositionsDamier
+
+
+class CodecPosition:
+    """
+    Codage binaire de taille fixe d'une situation de jeu. Chacune des 50
+    cases prend un des cinq états (vide, pion blanc, pion noir, dame blanche,
+    dame noire); les cases forment les chiffres d'un nombre en base 5 (la case
+    1 est le chiffre de poids fort), multiplié par 2 et augmenté de 1 si c'est
+    aux noirs de jouer. 2 x 5^50 < 2^118: le code tient sur 15 octets.
+
+    Une situation de jeu est représentée par ses "cases": un bytes (ou une
+    liste d'entiers) de 50 états, l'indice 0 correspondant à la case 1.
+    """
+
+    VIDE = 0
+    PION_BLANC = 1
+    PION_NOIR = 2
+    DAME_BLANCHE = 3
+    DAME_NOIRE = 4
+
+    etats = {
+        (TypePiece.PION, Couleur.BLANC): PION_BLANC,
+        (TypePiece.PION, Couleur.NOIR): PION_NOIR,
+        (TypePiece.DAME, Couleur.BLANC): DAME_BLANCHE,
+        (TypePiece.DAME, Couleur.NOIR): DAME_NOIRE
+    }
+
+    """ nombre d'octets d'un code """
+    taille = 15
+
+    """ états 0..4 -> chiffres "0".."4" """
+    _chiffres = bytes.maketrans(bytes(range(5)), b"01234")
+    """ base des blocs de 5 cases utilisés au décodage """
+    _base = 5 ** 5
+    """ blocs de cases de "encoderTableau": 11 cases puis 3 blocs de 13 """
+    _blocsTableau = [(0, 11), (11, 24), (24, 37), (37, 50)]
+
+    @staticmethod
+    def _construireBlocs():
+        """
+        Construit la table des 3125 blocs de 5 états, indexée par leur valeur
+        en base 5
+        """
+        blocs = []
+        for valeur in range(CodecPosition._base):
+            bloc = bytearray(5)
+            for i in range(4, -1, -1):
+                (valeur, bloc[i]) = divmod(valeur, 5)
+            blocs.append(bytes(bloc))
+        CodecPosition._blocs = blocs
+
+    @staticmethod
+    def getCases(damier):
+        """
+        Obtient les 50 états des cases d'un damier
+        @return bytes de 50 états
+        """
+        cases = bytearray(PositionsDamier.getNombrePositions())
+        for piece in damier.pieces:
+            cases[piece.position - 1] = CodecPosition.etats[(piece.typePiece, piece.couleur)]
+        return bytes(cases)
+
+    @staticmethod
+    def creerDamier(cases, trait):
+        """
+        Crée un damier à partir des états des cases et du trait
+        """
+        pieces = [[], [], [], []]
+        indices = {
+            CodecPosition.PION_NOIR: 0,
+            CodecPosition.PION_BLANC: 1,
+            CodecPosition.DAME_NOIRE: 2,
+            CodecPosition.DAME_BLANCHE: 3
+        }
+        for i in range(len(cases)):
+            if cases[i] != CodecPosition.VIDE:
+                pieces[indices[cases[i]]].append(i + 1)
+        damier = Damier(True, trait)
+        damier.creerPieces(pieces)
+        return damier
+
+    @staticmethod
+    def encoder(cases, trait):
+        """
+        Code une situation de jeu
+
+        @param cases
+        les 50 états des cases
+        @param trait
+        couleur qui a le trait
+        @return bytes de 15 octets
+        """
+        valeur = int(bytes(cases).translate(CodecPosition._chiffres), 5) * 2
+        if trait == Couleur.NOIR:
+            valeur = valeur + 1
+        return valeur.to_bytes(CodecPosition.taille, "little")
+
+    @staticmethod
+    def decoder(code):
+        """
+        Décode une situation de jeu
+
+        @param code
+        15 octets
+        @return le couple (bytes des 50 états, trait)
+        """
+        (valeur, noir) = divmod(int.from_bytes(code, "little"), 2)
+        blocs = []
+        for i in range(PositionsDamier.getNombrePositions() // 5):
+            (valeur, bloc) = divmod(valeur, CodecPosition._base)
+            blocs.append(CodecPosition._blocs[bloc])
+        blocs.reverse()
+        trait = Couleur.NOIR if noir else Couleur.BLANC
+        return (b"".join(blocs), trait)
+
+    @staticmethod
+    def encoderDamier(damier):
+        return CodecPosition.encoder(CodecPosition.getCases(damier), damier.prochainMouvement)
+
+    @staticmethod
+    def decoderDamier(code):
+        (cases, trait) = CodecPosition.decoder(code)
+        return CodecPosition.creerDamier(cases, trait)
+
+    @staticmethod
+    def encoderLot(positions):
+        """
+        Code une suite de situations de jeu
+
+        @param positions
+        itérable de couples (cases, trait)
+        @return bytes de 15 octets par situation de jeu, mis bout à bout
+        """
+        encoder = CodecPosition.encoder
+        return b"".join([encoder(cases, trait) for (cases, trait) in positions])
+
+    @staticmethod
+    def decoderLot(donnees):
+        """
+        Décode une suite de situations de jeu codées par "encoderLot"
+
+        @param donnees
+        bytes (ou memoryview) dont la taille est un multiple de 15
+        @return liste de couples (cases, trait)
+        """
+        taille = CodecPosition.taille
+        if len(donnees) % taille != 0:
+            raise ValueError("La taille des données n'est pas un multiple de {:d}".format(taille))
+        decoder = CodecPosition.decoder
+        return [decoder(donnees[i:i + taille]) for i in range(0, len(donnees), taille)]
+
+    @staticmethod
+    def encoderTableau(plateaux, traits):
+        """
+        Code un lot de situations de jeu avec NumPy (dépendance optionnelle),
+        sans boucle Python par situation: le code de 118 bits est calculé sur
+        4 mots de 32 bits (dans des entiers de 64 bits), par blocs de 13 cases
+
+        @param plateaux
+        tableau (N, 50) des états des cases
+        @param traits
+        tableau (N,) du trait (0 blanc, 1 noir, comme dans
+        dataset.DatasetPositions)
+        @return tableau (N, 15) uint8 des codes, identiques à ceux de "encoder"
+        """
+        import numpy
+        plateaux = numpy.asarray(plateaux).astype(numpy.uint64)
+        nombre = plateaux.shape[0]
+        # valeur des 11 premières cases, puis de chaque bloc de 13 cases
+        mots = numpy.zeros((4, nombre), dtype=numpy.uint64)
+        for (debut, fin) in CodecPosition._blocsTableau:
+            poids = numpy.uint64(5) ** numpy.arange(fin - debut - 1, -1, -1, dtype=numpy.uint64)
+            CodecPosition._multiplierAjouter(mots, 5 ** (fin - debut), plateaux[:, debut:fin] @ poids)
+        CodecPosition._multiplierAjouter(mots, 2, numpy.asarray(traits).astype(numpy.uint64))
+        octets = numpy.ascontiguousarray(mots.T, dtype="<u4").view(numpy.uint8)
+        return numpy.ascontiguousarray(octets[:, :CodecPosition.taille])
+
+    @staticmethod
+    def decoderTableau(codes):
+        """
+        Décode un lot de situations de jeu avec NumPy (voir "encoderTableau")
+
+        @param codes
+        tableau (N, 15) uint8 des codes, par exemple la colonne "plateau"
+        d'un fichier de positions (dataset.DatasetPositions.lire)
+        @return le couple (tableau (N, 50) int8 des états des cases, tableau
+        (N,) uint8 du trait: 0 blanc, 1 noir)
+        """
+        import numpy
+        codes = numpy.asarray(codes, dtype=numpy.uint8)
+        nombre = codes.shape[0]
+        octets = numpy.zeros((nombre, 16), dtype=numpy.uint8)
+        octets[:, :CodecPosition.taille] = codes
+        mots = octets.view("<u4").T.astype(numpy.uint64)
+        traits = (mots[0] & numpy.uint64(1)).astype(numpy.uint8)
+        # division par 2 des 4 mots
+        for i in range(3):
+            mots[i] = (mots[i] >> numpy.uint64(1)) | ((mots[i + 1] & numpy.uint64(1)) << numpy.uint64(31))
+        mots[3] >>= numpy.uint64(1)
+        plateaux = numpy.zeros((nombre, PositionsDamier.getNombrePositions()), dtype=numpy.int8)
+        cinq = numpy.uint64(5)
+        for (debut, fin) in reversed(CodecPosition._blocsTableau):
+            if debut == 0:
+                reste = mots[0]
+            else:
+                reste = CodecPosition._diviser(mots, 5 ** (fin - debut))
+            for case in range(fin - 1, debut - 1, -1):
+                plateaux[:, case] = reste % cinq
+                reste = reste // cinq
+        return (plateaux, traits)
+
+    @staticmethod
+    def _multiplierAjouter(mots, facteur, valeurs):
+        """
+        Multiplie par "facteur" (< 2^31) le nombre de 4 mots de 32 bits de
+        chaque situation et lui ajoute "valeurs" (< 2^32)
+        """
+        import numpy
+        retenue = valeurs
+        for i in range(4):
+            produit = mots[i] * numpy.uint64(facteur) + retenue
+            mots[i] = produit & numpy.uint64(0xFFFFFFFF)
+            retenue = produit >> numpy.uint64(32)
+
+    @staticmethod
+    def _diviser(mots, diviseur):
+        """
+        Divise par "diviseur" (< 2^31) le nombre de 4 mots de 32 bits de
+        chaque situation
+        @return les restes
+        """
+        import numpy
+        reste = numpy.zeros(mots.shape[1], dtype=numpy.uint64)
+        diviseur = numpy.uint64(diviseur)
+        for i in range(3, -1, -1):
+            courant = (reste << numpy.uint64(32)) | mots[i]
+            mots[i] = courant // diviseur
+            reste = courant % diviseur
+        return reste
+
+
+CodecPosition._construireBlocs()
@@ -0,0 +1,416 @@
+"""
+Interface en ligne de commande, sans affichage graphique: ce module n'importe
+ni tkinter ni PIL.
+
+Les situations de jeu sont lues ligne par ligne (fichiers ou entrée
+standard), au format JSON:
+
+    {"pieces": [[pions noirs], [pions blancs], [dames noires], [dames blanches]],
+     "trait": "BLANC"}
+
+ou en notation FEN: {"fen": "W:W31,32,K45:B1,2"}. Une ligne vide ou "{}"
+représente la position initiale. Les résultats sont écrits sur la sortie
+standard, un objet JSON par ligne.
+"""
+import argparse
+import json
+import sys
+import time
+
+from .base_finales import BaseFinales
+from .codec_position import CodecPosition
+from .constants import Couleur
+from .coup import Coup
+from .damier import Damier
+from .damier_exception import DamierException
+from .dataset import EcrivainPositions, ResultatPartie
+from .engine import Engine
+from .livre_ouvertures import ConstructeurLivre, LivreOuvertures
+from .mouvement import Mouvement
+from .mouvement_unitaire import MouvementUnitaire
+from .pdn import LecteurPdn, RejeuPdn
+from .perft import Perft
+
+
+def decoderSituation(ligne):
+    """
+    Décode et vérifie une situation de jeu au format JSON
+
+    @param ligne
+    texte d'une ligne (vide pour la position initiale)
+    @return le dictionnaire de la situation
+    @throws DamierException
+    si la ligne n'est pas une situation de jeu
+    """
+    if ligne == "":
+        return {}
+    try:
+        situation = json.loads(ligne)
+    except ValueError as e:
+        raise DamierException("JSON invalide: {}".format(e))
+    if not isinstance(situation, dict):
+        raise DamierException("La situation de jeu doit être un objet JSON")
+    fen = situation.get("fen")
+    if fen is not None and not isinstance(fen, str):
+        raise DamierException('"fen" doit être une chaîne de caractères')
+    pieces = situation.get("pieces")
+    if pieces is not None:
+        if not isinstance(pieces, list) or len(pieces) != 4 or \
+                not all(isinstance(groupe, list) for groupe in pieces):
+            raise DamierException('"pieces" doit être une liste de 4 listes de positions '
+                                  '(pions noirs, pions blancs, dames noires, dames blanches)')
+        for groupe in pieces:
+            for position in groupe:
+                if not isinstance(position, int) or isinstance(position, bool):
+                    raise DamierException("Position invalide dans \"pieces\": {}".format(
+                        json.dumps(position)))
+    trait = situation.get("trait")
+    if trait is not None and not isinstance(trait, str):
+        raise DamierException('"trait" doit être "BLANC" ou "NOIR"')
+    coups = situation.get("coups")
+    if coups is not None and (not isinstance(coups, list) or
+                              not all(isinstance(coup, str) for coup in coups)):
+        raise DamierException('"coups" doit être une liste de coups, par exemple ["32-28"]')
+    return situation
+
+
+def creerDamier(situation):
+    """
+    Crée un damier à partir d'une situation de jeu au format JSON
+
+    @param situation
+    dictionnaire avec la clé "fen" ou les clés "pieces" et "trait"
+    (position initiale si "pieces" est absent)
+    """
+    if situation is not None and situation.get("fen") is not None:
+        return Damier.depuisFen(situation["fen"])
+    if situation is None or situation.get("pieces") is None:
+        damier = Damier()
+    else:
+        damier = Damier(True)
+        damier.creerPieces(situation["pieces"])
+    trait = situation.get("trait") if situation is not None else None
+    if trait is not None:
+        if trait not in Couleur.all:
+            raise DamierException("Couleur inconnue: {}".format(trait))
+        damier.prochainMouvement = trait
+    return damier
+
+
+def decrireDamier(damier):
+    """
+    Obtient la situation de jeu d'un damier au format JSON
+    """
+    return {"fen": damier.toFen(), "pieces": damier.getPositionsPieces(),
+            "trait": damier.prochainMouvement}
+
+
+def lireSituations(fichiers):
+    """
+    Lit les situations de jeu, une par ligne
+
+    @param fichiers
+    noms des fichiers à lire, "-" ou liste vide pour l'entrée standard
+    @return générateur de couples (numéro de ligne, texte de la ligne),
+    décodés par decoderSituation
+    """
+    if len(fichiers) == 0:
+        fichiers = ["-"]
+    numero = 0
+    for nomFichier in fichiers:
+        if nomFichier == "-":
+            fichier = sys.stdin
+        else:
+            fichier = open(nomFichier, "r", encoding="utf-8")
+        try:
+            for ligne in fichier:
+                numero = numero + 1
+                yield (numero, ligne.strip())
+        finally:
+            if fichier is not sys.stdin:
+                fichier.close()
+
+
+def ecrire(resultat):
+    sys.stdout.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+
+
+def analyser(options):
+    """
+    Écrit, pour chaque situation de jeu, la liste des coups possibles
+    """
+    for (numero, ligne) in lireSituations(options.fichiers):
+        try:
+            damier = creerDamier(decoderSituation(ligne))
+            mouvements = damier.analyse()
+            coups = MouvementUnitaire.getVariantes(mouvements)
+            ecrire({"ligne": numero, "trait": damier.prochainMouvement,
+                    "coups": coups,
+                    "priseMax": MouvementUnitaire.getMaxCaptures(mouvements),
+                    "termine": len(coups) == 0})
+        except (DamierException, ValueError, KeyError, TypeError, IndexError) as e:
+            ecrire({"ligne": numero, "erreur": str(e)})
+    return 0
+
+
+def valider(options):
+    """
+    Rejoue, pour chaque ligne, une liste de coups ("coups") à partir d'une
+    situation de jeu et signale le premier coup invalide
+    """
+    result = 0
+    for (numero, ligne) in lireSituations(options.fichiers):
+        resultat = {"ligne": numero}
+        indice = 0
+        try:
+            situation = decoderSituation(ligne)
+            damier = creerDamier(situation)
+            for coup in situation.get("coups", []):
+                mouvement = Mouvement(damier, coup)
+                mouvement.valider()
+                mouvement.execute()
+                indice = indice + 1
+            resultat["valide"] = True
+            resultat["position"] = decrireDamier(damier)
+        except (DamierException, ValueError, KeyError, TypeError, IndexError) as e:
+            resultat["valide"] = False
+            resultat["indice"] = indice
+            resultat["erreur"] = str(e)
+            result = 1
+        ecrire(resultat)
+    return result
+
+
+def perft(options):
+    """
+    Compte les noeuds (perft ou divide) pour chaque situation de jeu
+    """
+    for (numero, ligne) in lireSituations(options.fichiers):
+        try:
+            damier = creerDamier(decoderSituation(ligne))
+        except (DamierException, ValueError, KeyError, TypeError, IndexError) as e:
+            ecrire({"ligne": numero, "erreur": str(e)})
+            continue
+        debut = time.monotonic()
+        resultat = {"ligne": numero, "profondeur": options.profondeur}
+        if options.divide:
+            coups = Perft.diviser(damier, options.profondeur, options.jobs)
+            resultat["coups"] = dict(coups)
+            resultat["noeuds"] = sum(noeuds for (coup, noeuds) in coups)
+        else:
+            resultat["noeuds"] = Perft.compterParallele(
+                damier, options.profondeur, options.jobs)
+        duree = time.monotonic() - debut
+        resultat["duree"] = round(duree, 3)
+        resultat["noeudsParSeconde"] = int(resultat["noeuds"] / duree) if duree > 0 else 0
+        ecrire(resultat)
+    return 0
+
+
+def jouer(options):
+    """
+    Fait jouer le moteur contre lui-même à partir de chaque situation de jeu
+    et écrit chaque coup joué puis le résultat de la partie (avec
+    --statistiques, les compteurs de coupures de chaque recherche). Avec --dataset,
+    chaque position est ajoutée au fichier de positions avec le coup choisi et
+    le résultat de la partie (inconnu si la partie est interrompue).
+    """
+    ecrivain = EcrivainPositions(options.dataset) if options.dataset is not None else None
+    finales = BaseFinales(options.finales) if options.finales is not None else None
+    livre = LivreOuvertures(options.livre) if options.livre is not None else None
+    try:
+        with Engine(dureeMax=options.duree, noeudsMax=options.noeuds,
+                    profondeurMax=options.profondeur, processus=options.jobs,
+                    noeudsQuiescence=options.quiescence, finales=finales,
+                    livre=livre) as moteur:
+            for (numero, ligne) in lireSituations(options.fichiers):
+                try:
+                    damier = creerDamier(decoderSituation(ligne))
+                except (DamierException, ValueError, KeyError, TypeError, IndexError) as e:
+                    ecrire({"ligne": numero, "erreur": str(e)})
+                    continue
+                gagnant = None
+                termine = False
+                demiCoups = 0
+                positions = []
+                while demiCoups < options.demi_coups:
+                    resultatRecherche = moteur.rechercher(damier)
+                    if resultatRecherche.coup is None:
+                        gagnant = Couleur.autre(damier.prochainMouvement)
+                        termine = True
+                        break
+                    resultat = resultatRecherche.toDict()
+                    resultat["ligne"] = numero
+                    resultat["trait"] = damier.prochainMouvement
+                    if options.statistiques:
+                        resultat["statistiques"] = resultatRecherche.statistiques
+                    ecrire(resultat)
+                    if ecrivain is not None:
+                        positions.append((CodecPosition.encoderDamier(damier), damier.prochainMouvement,
+                                          Coup.getIndiceCanonique(damier.legalMoves(),
+                                                                  resultatRecherche.coupLegal)))
+                    # le coup vient du générateur: il est joué sans validation
+                    Mouvement.depuisCoup(damier, resultatRecherche.coupLegal).execute()
+                    demiCoups = demiCoups + 1
+                if ecrivain is not None:
+                    resultatPartie = ResultatPartie.depuisGagnant(gagnant) if termine \
+                        else ResultatPartie.INCONNU
+                    for (code, trait, indice) in positions:
+                        ecrivain.ajouterCode(code, trait, indice, resultatPartie)
+                ecrire({"ligne": numero, "demiCoups": demiCoups, "gagnant": gagnant,
+                        "position": decrireDamier(damier)})
+    finally:
+        if ecrivain is not None:
+            ecrivain.fermer()
+        if finales is not None:
+            finales.fermer()
+        if livre is not None:
+            livre.fermer()
+    return 0
+
+
+def rejouerPdn(options):
+    """
+    Rejoue les parties de fichiers PDN et écrit, pour chaque partie, le
+    résultat et le premier coup invalide. Avec --dataset, les positions des
+    coups rejoués sont ajoutées au fichier de positions.
+    """
+    result = 0
+    ecrivain = EcrivainPositions(options.dataset) if options.dataset is not None else None
+    try:
+        for nomFichier in options.fichiers:
+            result = max(result, rejouerFichierPdn(nomFichier, options, ecrivain))
+    finally:
+        if ecrivain is not None:
+            ecrivain.fermer()
+    return result
+
+
+def rejouerFichierPdn(nomFichier, options, ecrivain):
+    result = 0
+    collecterPositions = ecrivain is not None
+    parties = LecteurPdn.lireFichier(nomFichier, options.mmap)
+    if options.jobs > 1:
+        rejeux = RejeuPdn.rejouerEnParallele(parties, options.jobs,
+                                             collecterPositions=collecterPositions)
+    else:
+        rejeux = (RejeuPdn.rejouer(partie, collecterPositions) for partie in parties)
+    for rejeu in rejeux:
+        partie = rejeu.partie
+        resultat = {"fichier": nomFichier, "partie": partie.numero,
+                    "resultat": partie.resultat, "coups": len(partie.coups),
+                    "coupsJoues": rejeu.coupsJoues, "valide": rejeu.estValide}
+        if not rejeu.estValide:
+            resultat["coupInvalide"] = rejeu.coupInvalide
+            resultat["erreur"] = rejeu.erreur
+            result = 1
+        elif options.positions:
+            resultat["position"] = {"fen": rejeu.fen, "pieces": rejeu.pieces,
+                                    "trait": rejeu.trait}
+        if ecrivain is not None:
+            resultatPartie = ResultatPartie.depuisPdn(partie.resultat)
+            for (code, trait, indice, cle) in rejeu.positions:
+                ecrivain.ajouterCode(code, trait, indice, resultatPartie)
+        ecrire(resultat)
+    return result
+
+
+def construireLivre(options):
+    """
+    Construit un livre d'ouvertures à partir des premiers demi-coups des
+    parties de fichiers PDN et écrit le nombre de parties et d'enregistrements
+    """
+    constructeur = ConstructeurLivre(options.demi_coups)
+    for nomFichier in options.fichiers:
+        constructeur.ajouterFichier(nomFichier, options.mmap, options.jobs)
+    enregistrements = constructeur.ecrire(options.sortie, options.parties_min)
+    ecrire({"livre": options.sortie, "parties": constructeur.parties,
+            "enregistrements": enregistrements})
+    return 0
+
+
+def creerParser():
+    parser = argparse.ArgumentParser(
+        prog="damier_game", description="Analyse de parties de dames, sans interface graphique")
+    sousCommandes = parser.add_subparsers(dest="commande")
+    sousCommandes.required = True
+
+    commande = sousCommandes.add_parser(
+        "analyse", help="liste les coups possibles de chaque situation de jeu")
+    commande.add_argument("fichiers", nargs="*",
+                          help="fichiers de situations de jeu (entrée standard par défaut)")
+    commande.set_defaults(fonction=analyser)
+
+    commande = sousCommandes.add_parser(
+        "valider", help="vérifie des listes de coups (clé \"coups\")")
+    commande.add_argument("fichiers", nargs="*")
+    commande.set_defaults(fonction=valider)
+
+    commande = sousCommandes.add_parser(
+        "perft", help="compte les noeuds de l'arbre des coups")
+    commande.add_argument("profondeur", type=int)
+    commande.add_argument("fichiers", nargs="*")
+    commande.add_argument("--divide", action="store_true",
+                          help="détaille le nombre de noeuds par coup de départ")
+    commande.add_argument("--jobs", type=int, default=1,
+                          help="nombre de processus de calcul")
+    commande.set_defaults(fonction=perft)
+
+    commande = sousCommandes.add_parser(
+        "jouer", help="fait jouer le moteur contre lui-même")
+    commande.add_argument("fichiers", nargs="*")
+    commande.add_argument("--duree", type=float, default=1.0,
+                          help="durée maximale de recherche par coup, en secondes")
+    commande.add_argument("--noeuds", type=int, default=None,
+                          help="nombre maximal de noeuds par coup")
+    commande.add_argument("--profondeur", type=int, default=64,
+                          help="profondeur maximale de recherche")
+    commande.add_argument("--quiescence", type=int, default=256,
+                          help="nombre maximal de noeuds par recherche des prises après la "
+                               "profondeur maximale (0: sans quiescence)")
+    commande.add_argument("--demi-coups", type=int, default=200,
+                          help="nombre maximal de demi-coups par partie")
+    commande.add_argument("--jobs", type=int, default=1,
+                          help="nombre de processus de calcul")
+    commande.add_argument("--dataset", default=None,
+                          help="fichier de positions où ajouter les positions jouées")
+    commande.add_argument("--livre", default=None,
+                          help="livre d'ouvertures consulté avant chaque recherche (voir la commande livre)")
+    commande.add_argument("--finales", default=None,
+                          help="répertoire des bases de finales (voir damier_game.base_finales)")
+    commande.add_argument("--statistiques", action="store_true",
+                          help="écrit les compteurs de coupures et de la table de transposition")
+    commande.set_defaults(fonction=jouer)
+
+    commande = sousCommandes.add_parser(
+        "pdn", help="rejoue et valide les parties de fichiers PDN")
+    commande.add_argument("fichiers", nargs="+")
+    commande.add_argument("--mmap", action="store_true",
+                          help="projette les fichiers en mémoire au lieu de les lire par blocs")
+    commande.add_argument("--positions", action="store_true",
+                          help="écrit la position finale des parties valides")
+    commande.add_argument("--jobs", type=int, default=1,
+                          help="nombre de processus de calcul (les résultats restent dans l'ordre des parties)")
+    commande.add_argument("--dataset", default=None,
+                          help="fichier de positions où ajouter les positions rejouées")
+    commande.set_defaults(fonction=rejouerPdn)
+
+    commande = sousCommandes.add_parser(
+        "livre", help="construit un livre d'ouvertures à partir de fichiers PDN")
+    commande.add_argument("fichiers", nargs="+")
+    commande.add_argument("--sortie", required=True, help="fichier du livre d'ouvertures")
+    commande.add_argument("--demi-coups", type=int, default=20,
+                          help="nombre de demi-coups retenus au début de chaque partie")
+    commande.add_argument("--parties-min", type=int, default=1,
+                          help="nombre minimal de parties pour qu'un coup soit retenu")
+    commande.add_argument("--mmap", action="store_true",
+                          help="projette les fichiers en mémoire au lieu de les lire par blocs")
+    commande.add_argument("--jobs", type=int, default=1,
+                          help="nombre de processus de calcul")
+    commande.set_defaults(fonction=construireLivre)
+    return parser
+
+
+def main(args=None):
+    options = creerParser().parse_args(args)
+    return options.fonction(options)
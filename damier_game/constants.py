@@ -28,3 +28,10 @@ class TypePiece:
     PION = "PION"
     DAME = "DAME"
     all = [PION, DAME]
+
+
+class MoteurAnalyse:
+    """ moteur utilisé par Damier.analyse pour générer les mouvements """
+    PIECES = "PIECES"
+    BITBOARD = "BITBOARD"
+    all = [PIECES, BITBOARD]
@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+from .constants import TypePiece
+from .position_damier import PositionsDamier
+
+
+class Coup(namedtuple("Coup", ["depart", "arrivee", "chemin", "captures", "promotion"])):
+    """
+    Coup complet, immuable, tel que renvoyé par Damier.legalMoves:
+        depart     position de départ
+        arrivee    position d'arrivée
+        chemin     positions successives de la pièce, départ et arrivée compris
+        captures   masque des positions capturées (le bit n - 1 correspond à la
+                   case n, comme dans Bitboard)
+        promotion  true si un pion est promu en dame à la fin du coup
+
+    Deux chemins qui partent de la même case, arrivent sur la même case et
+    prennent les mêmes pièces sont le même coup.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def depuisChemin(chemin, piece):
+        """
+        Crée un coup à partir d'un chemin de mouvements unitaires
+
+        @param chemin
+        liste des mouvements unitaires (voir MouvementUnitaire.getChemins)
+        @param piece
+        la pièce déplacée
+        """
+        positions = [chemin[0].positionDepart]
+        captures = 0
+        for mu in chemin:
+            positions.append(mu.positionDestination)
+            if mu.estCapture:
+                captures |= 1 << (mu.positionCapturee - 1)
+        arrivee = positions[-1]
+        promotion = piece.typePiece == TypePiece.PION and \
+            PositionsDamier.estLigneDeFond(arrivee, piece.couleur)
+        return Coup(positions[0], arrivee, tuple(positions), captures, promotion)
+
+    @property
+    def cle(self):
+        """
+        @return ce qui identifie le coup: départ, arrivée et pièces capturées
+        """
+        return (self.depart, self.arrivee, self.captures)
+
+    @property
+    def estCapture(self):
+        return self.captures != 0
+
+    @property
+    def nombreCaptures(self):
+        return bin(self.captures).count("1")
+
+    def getPositionsCapturees(self):
+        """
+        @return les positions capturées, dans l'ordre croissant
+        """
+        result = []
+        masque = self.captures
+        while masque:
+            bit = masque & -masque
+            result.append(bit.bit_length())
+            masque ^= bit
+        return result
+
+    def getManoury(self):
+        """
+        Obtient la representation Manoury du coup, par exemple "32-28" ou
+        "26x37x48"
+        """
+        separateur = "x" if self.estCapture else "-"
+        return separateur.join("{:d}".format(position) for position in self.chemin)
+
+    @staticmethod
+    def getOrdreCanonique(coups):
+        """
+        Classe des coups dans l'ordre canonique: par clé (départ, arrivée,
+        pièces capturées). Contrairement à l'ordre de Damier.legalMoves, il ne
+        dépend pas du moteur d'analyse: l'indice d'un coup dans cet ordre peut
+        être enregistré dans un fichier.
+
+        @param coups
+        coups possibles d'une situation de jeu (Damier.legalMoves)
+        @return nouvelle liste des coups, dans l'ordre canonique
+        """
+        return sorted(coups, key=lambda coup: coup.cle)
+
+    @staticmethod
+    def getIndiceCanonique(coups, coup):
+        """
+        @param coups
+        coups possibles d'une situation de jeu (Damier.legalMoves)
+        @param coup
+        l'un de ces coups
+        @return l'indice du coup dans l'ordre canonique des coups possibles
+        @throws ValueError
+        si le coup n'est pas parmi les coups possibles
+        """
+        return [coupPossible.cle for coupPossible in Coup.getOrdreCanonique(coups)].index(coup.cle)
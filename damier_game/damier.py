@@ -1,9 +1,14 @@
 from .piece import Piece
 from .pion import Pion
 from .dame import Dame
-from .constants import Couleur, Direction
+from .coup import Coup
+from .constants import Couleur, TypePiece, MoteurAnalyse
 from .position_damier import PositionsDamier
 from .mouvement_unitaire import MouvementUnitaire
+from .bitboard import Bitboard
+from .zobrist import Zobrist
+from .evaluation import Evaluation
+from .damier_exception import DamierException
 
 
 class Damier:
@@ -26,22 +31,79 @@ class Damier:
     @property
     def pieces(self):
         """
-        Obtient la liste des pièces
-        @return la liste des pièces
+        Obtient les pièces, dans l'ordre où elles ont été placées (une pièce
+        capturée puis remise par "unmake" retrouve sa place)
+        @return une vue (sans copie) des pièces, mise à jour avec le damier
         """
-        return self._pieces
+        return self._pieces.keys()
 
-    def __init__(self, tableVide = False, prochainMouvement = Couleur.BLANC):
+    @property
+    def cle(self):
+        """
+        @return la clé Zobrist de 64 bits de la situation de jeu (pièces et
+        trait), mise à jour à chaque pièce placée, retirée ou déplacée
+        """
+        return self._clePieces ^ Zobrist.getCleTrait(self._prochainMouvement)
+
+    @property
+    def evaluation(self):
+        """
+        @return l'évaluation statique de la situation de jeu, du point de vue
+        des blancs (voir Evaluation), mise à jour comme la clé Zobrist à
+        chaque pièce placée, retirée ou déplacée
+        """
+        return self._evaluation
+
+    @property
+    def moteurAnalyse(self):
+        """
+        @return le moteur utilisé pour analyser une situation de jeu (liste
+        des pièces ou bitboard)
+        """
+        return self._moteurAnalyse
+
+    @moteurAnalyse.setter
+    def moteurAnalyse(self, moteur):
+        self._moteurAnalyse = moteur
+
+    def __init__(self, tableVide = False, prochainMouvement = Couleur.BLANC,
+                 moteurAnalyse = MoteurAnalyse.BITBOARD):
         self._prochainMouvement = prochainMouvement
-        self._pieces = []
+        self._moteurAnalyse = moteurAnalyse
+        self.initialiserPieces()
         if not tableVide:
             self.nouveauJeu()
 
+    def initialiserPieces(self):
+        """
+        Vide le damier: la liste des pièces, le tableau des cases (une case
+        par position Manoury, l'indice 0 n'est pas utilisé) et les ensembles
+        de pièces par couleur
+        """
+        # chaque pièce garde son emplacement dans "_occupants" (None quand
+        # elle est retirée): la remettre ne change pas l'ordre des pièces
+        self._occupants = []
+        self._emplacements = {}
+        # dictionnaires utilisés comme ensembles de pièces ordonnés par
+        # emplacement
+        self._pieces = {}
+        self._piecesParCouleur = {}
+        for couleur in Couleur.all:
+            self._piecesParCouleur[couleur] = {}
+        self._historique = []
+        self._clePieces = 0
+        self._evaluation = 0
+        # résultats de "analyse" et "legalMoves" pour la dernière situation
+        # de jeu analysée: (clé Zobrist, moteur d'analyse, résultat)
+        self._cacheAnalyse = None
+        self._cacheCoups = None
+        self._cases = [None] * (PositionsDamier.getNombrePositions() + 1)
+
     def nouveauJeu(self):
         """
         Initialise le damier pour un nouveau jeu
         """
-        self._pieces = []
+        self.initialiserPieces()
         # le blanc commence le jeu
         self._prochainMouvement = Couleur.BLANC
         positionsInitialesPionsNoirs = PositionsDamier.getPositionsInitiales(
@@ -88,17 +150,13 @@ class Damier:
 
     def getPieces(self, couleur):
         """
-        Obtient la liste des pièces pour une couleur donnée
+        Obtient les pièces pour une couleur donnée, dans l'ordre de "pieces"
 
         @param couleur
         (noir, ou blanc)
-        @return la liste des pièces pour la couleur donnée
+        @return une vue (sans copie) des pièces pour la couleur donnée
         """
-        piecesParCouleur = []
-        for p in self.pieces:
-            if p.couleur == couleur:
-                piecesParCouleur.append(p)
-        return piecesParCouleur
+        return self._piecesParCouleur[couleur].keys()
 
     def getPiece(self, position):
         """
@@ -111,19 +169,80 @@ class Damier:
         """
         if PositionsDamier.estPositionInvalide(position):
             return None
-
-        # on cherche parmis les pièces s'il y a une qui ocupe la position
-        # donnée
-        for piece in self.pieces:
-            if piece.position == position:
-                return piece
-        return None
+        return self._cases[position]
 
     def addPiece(self, piece):
-        self._pieces.append(piece)
+        """
+        Ajoute une pièce déjà positionnée à la liste des pièces et à l'index
+        des cases
+        """
+        emplacement = self._emplacements.get(piece)
+        if emplacement is None or self._occupants[emplacement] is not None:
+            emplacement = len(self._occupants)
+            self._emplacements[piece] = emplacement
+            self._occupants.append(None)
+        self._occupants[emplacement] = piece
+        self._insererPiece(self._pieces, piece, emplacement)
+        self._insererPiece(self._piecesParCouleur[piece.couleur], piece, emplacement)
+        self._cases[piece.position] = piece
+        self._clePieces ^= Zobrist.getCle(piece.typePiece,
+                                         piece.couleur, piece.position)
+        self._evaluation += Evaluation.getValeur(piece.typePiece,
+                                                 piece.couleur, piece.position)
 
     def removePiece(self, piece):
-        self._pieces.remove(piece)
+        """
+        Retire une pièce de la liste des pièces et de l'index des cases
+        """
+        self._occupants[self._emplacements[piece]] = None
+        del self._pieces[piece]
+        del self._piecesParCouleur[piece.couleur][piece]
+        self._cases[piece.position] = None
+        self._clePieces ^= Zobrist.getCle(piece.typePiece,
+                                         piece.couleur, piece.position)
+        self._evaluation -= Evaluation.getValeur(piece.typePiece,
+                                                 piece.couleur, piece.position)
+
+    def cederEmplacement(self, piece, remplacante):
+        """
+        Réserve l'emplacement d'une pièce à la pièce qui va la remplacer (la
+        dame d'un pion promu): après la promotion, et après son annulation,
+        l'ordre des pièces est inchangé
+        """
+        self._emplacements[remplacante] = self._emplacements[piece]
+
+    def _insererPiece(self, pieces, piece, emplacement):
+        """
+        Ajoute une pièce à un ensemble ordonné de pièces: une pièce remise à
+        un emplacement antérieur (capture ou promotion annulée) est replacée
+        devant les pièces des emplacements suivants
+
+        @param pieces
+        dictionnaire pièce -> None, ordonné par emplacement
+        """
+        derniere = next(reversed(pieces), None)
+        pieces[piece] = None
+        if derniere is None or self._emplacements[derniere] < emplacement:
+            return
+        for suivante in [p for p in pieces if self._emplacements[p] > emplacement]:
+            del pieces[suivante]
+            pieces[suivante] = None
+
+    def deplacerPiece(self, piece, destination):
+        """
+        Met à jour l'index des cases pour une pièce qui change de position
+
+        @param piece
+        la pièce déplacée (encore sur sa position de départ)
+        @param destination
+        la nouvelle position de la pièce
+        """
+        self._cases[piece.position] = None
+        self._cases[destination] = piece
+        clesPiece = Zobrist.cles[(piece.typePiece, piece.couleur)]
+        self._clePieces ^= clesPiece[piece.position] ^ clesPiece[destination]
+        valeursPiece = Evaluation.valeurs[(piece.typePiece, piece.couleur)]
+        self._evaluation += valeursPiece[destination] - valeursPiece[piece.position]
 
     def getPositionsLibres(self, position, direction):
         """
@@ -138,19 +257,12 @@ class Damier:
         @return liste des positions libres
         """
         result = []
-        # tant qu'il y a des positions libres sur le damier on les rajoute à la liste de résultat
-        while True:
-            # on obtient la position voisine à un position et direction données
-            positionVoisine = PositionsDamier.getPositionVoisine(
-                position, direction)
-            # si elle est valide et libre
-            if PositionsDamier.estPositionValide(positionVoisine) and self.estPositionLibre(positionVoisine):
-                # on la rajoute à la liste des positions libres
-                result.append(positionVoisine)
-                # on redefinit la position par la valeur de la positionVoisine
-                position = positionVoisine
-            else:
-                return result
+        # on parcourt la diagonale tant que les positions sont libres
+        for positionVoisine in PositionsDamier.getRayon(position, direction):
+            if not self.estPositionLibre(positionVoisine):
+                break
+            result.append(positionVoisine)
+        return result
 
     def getPremierePiece(self, position, direction):
         """
@@ -176,7 +288,7 @@ class Damier:
             # données, on trouve la pièce voisine à la dernière position libre. C'est cette
             # pièce voisine qui est la pièce la plus proche recherchée.
         else:
-            dernierePositionLibre = positionsLibres 
+            dernierePositionLibre = positionsLibres[-1]
             positionPremierePiece = PositionsDamier.getPositionVoisine(
                 dernierePositionLibre, direction)
         return self.getPiece(positionPremierePiece)
@@ -184,22 +296,135 @@ class Damier:
     def analyse(self):
         """
         Analyse une situation de jeu pour déterminer la liste des mouvements
-        possibles
+        possibles. Le résultat est mémorisé pour la situation de jeu (clé
+        Zobrist): tant qu'aucun coup n'est joué, les appels suivants (indices
+        de Board, validation de Mouvement, fin de partie) le renvoient sans
+        nouvelle analyse. Il ne doit donc pas être modifié.
 
         @return liste de mouvements unitaires possibles
         """
-        mouvements = []
+        cle = (self.cle, self.moteurAnalyse)
+        if self._cacheAnalyse is not None and self._cacheAnalyse[0] == cle:
+            return self._cacheAnalyse[1]
+        if self.moteurAnalyse == MoteurAnalyse.BITBOARD:
+            mouvements = Bitboard.depuisDamier(self).analyse(self.prochainMouvement)
+        else:
+            mouvements = self.analysePieces()
+        self._cacheAnalyse = (cle, mouvements)
+        return mouvements
+
+    def analysePieces(self):
+        """
+        Analyse une situation de jeu en interrogeant chaque pièce du damier
 
+        @return liste de mouvements unitaires possibles
+        """
         # on obtient la liste des pièces qu'on peut déplacer au prochain mouvement
         pieces = self.getPieces(self.prochainMouvement)
+
+        # la plus longue prise de chaque pièce est d'abord calculée: seules
+        # les pièces qui ont la prise maximale produisent ensuite leurs coups
+        preneurs = []
+        longueurMax = 0
         for piece in pieces:
-            mouvementsPiece = piece.analyse(True)
-            mouvements = mouvements + mouvementsPiece
+            etapes = {}
+            longueur = piece.getPriseMax(etapes)
+            if longueur > 0 and longueur >= longueurMax:
+                longueurMax = longueur
+                preneurs.append((longueur, piece, etapes))
+        if longueurMax > 0:
+            chemins = []
+            for (longueur, piece, etapes) in preneurs:
+                if longueur == longueurMax:
+                    chemins.extend(piece.genererPrises(etapes))
+            return MouvementUnitaire.depuisChemins(chemins)
 
-        # on enlève les mouvements qui n'ont pas de prise maximale
-        MouvementUnitaire.removeNonMaximal(mouvements)
+        mouvements = []
+        for piece in pieces:
+            mouvements = mouvements + piece.getDestinationsPossiblesSansCapture()
         return mouvements
 
+    def legalMoves(self):
+        """
+        Obtient la liste des coups possibles, sans doublons: les chemins de
+        l'arbre de Damier.analyse qui ont les mêmes cases de départ et
+        d'arrivée et prennent les mêmes pièces sont un seul coup (le premier
+        chemin est gardé)
+
+        @return liste de Coup, dans l'ordre de Damier.analyse (mémorisée
+        comme le résultat de "analyse", elle ne doit pas être modifiée)
+        """
+        cle = (self.cle, self.moteurAnalyse)
+        if self._cacheCoups is not None and self._cacheCoups[0] == cle:
+            return self._cacheCoups[1]
+        result = []
+        cles = set()
+        for chemin in MouvementUnitaire.getChemins(self.analyse()):
+            coup = Coup.depuisChemin(chemin, self._cases[chemin[0].positionDepart])
+            if coup.cle not in cles:
+                cles.add(coup.cle)
+                result.append(coup)
+        self._cacheCoups = (cle, result)
+        return result
+
+    def make(self, mouvement):
+        """
+        Joue un coup complet, sans vérifier sa validité, et mémorise de quoi
+        l'annuler avec "unmake". Les pièces capturées et le pion promu sont
+        conservés dans l'enregistrement d'annulation: aucune pièce n'est créée.
+
+        @param mouvement
+        un Coup (voir legalMoves) ou le chemin du coup: liste des mouvements
+        unitaires, avec leurs positions capturées (voir
+        MouvementUnitaire.getChemins)
+        """
+        # les pièces capturées sont retirées de l'index mais gardent leur
+        # position, ce qui permet de les remettre à l'identique
+        capturees = []
+        if isinstance(mouvement, Coup):
+            positionDepart = mouvement.depart
+            positionDestination = mouvement.arrivee
+            for position in mouvement.getPositionsCapturees():
+                capturees.append(self._cases[position])
+        else:
+            positionDepart = mouvement[0].positionDepart
+            positionDestination = mouvement[-1].positionDestination
+            for mu in mouvement:
+                if mu.estCapture:
+                    capturees.append(self._cases[mu.positionCapturee])
+        piece = self._cases[positionDepart]
+
+        for capturee in capturees:
+            self.removePiece(capturee)
+
+        # la promotion n'a lieu qu'à la fin du coup
+        Piece.deplacer(piece, positionDestination)
+        promotion = piece.typePiece == TypePiece.PION and \
+            PositionsDamier.estLigneDeFond(positionDestination, piece.couleur)
+        if promotion:
+            piece.promotion()
+
+        self._historique.append((piece, positionDepart, tuple(capturees),
+                                 promotion, self._prochainMouvement))
+        self.prochainMouvement = Couleur.autre(piece.couleur)
+
+    def unmake(self):
+        """
+        Annule le dernier coup joué avec "make" et restaure exactement la
+        situation de jeu précédente
+        """
+        (piece, positionDepart, capturees, promotion,
+         prochainMouvement) = self._historique.pop()
+        if promotion:
+            dame = piece.getDame()
+            positionDestination = dame.position
+            dame.retirer()
+            piece.placer(self, positionDestination)
+        Piece.deplacer(piece, positionDepart)
+        for capturee in capturees:
+            self.addPiece(capturee)
+        self.prochainMouvement = prochainMouvement
+
     def retirer(self, positionCapturee):
         """
         Retire une pièce depuis une position donnée
@@ -209,7 +434,7 @@ class Damier:
         """
         piece = self.getPiece(positionCapturee)
         if not piece is None:
-            self._pieces.remove(piece)
+            self.removePiece(piece)
 
     def creerPion(self, position, couleur):
         """
@@ -236,6 +461,62 @@ class Damier:
         dame = Dame(couleur)
         dame.placer(self, position)
 
+    @staticmethod
+    def depuisFen(fen):
+        """
+        Crée un damier à partir d'une notation FEN, par exemple
+        "W:W31,32,K45:B1,2,K3" (trait, puis pièces blanches et noires, les
+        dames étant préfixées par K; "B1-20" est accepté pour une suite de
+        positions)
+
+        @param fen
+        la notation FEN
+        @return le damier
+        @throws DamierException
+        si la notation est incorrecte
+        """
+        sections = fen.strip().rstrip(".").split(":")
+        trait = sections[0].strip().upper()
+        if trait not in ("W", "B"):
+            raise DamierException("Notation FEN incorrecte: " + fen)
+        damier = Damier(True, Couleur.BLANC if trait == "W" else Couleur.NOIR)
+        pieces = [[], [], [], []]
+        for section in sections[1:]:
+            section = section.strip()
+            if section == "":
+                continue
+            if section[0].upper() not in ("W", "B"):
+                raise DamierException("Notation FEN incorrecte: " + fen)
+            i = 1 if section[0].upper() == "W" else 0
+            for element in section[1:].split(","):
+                element = element.strip()
+                if element == "":
+                    continue
+                j = i
+                if element[0].upper() == "K":
+                    j = i + 2
+                    element = element[1:]
+                try:
+                    bornes = [int(borne) for borne in element.split("-")]
+                except ValueError:
+                    raise DamierException("Notation FEN incorrecte: " + fen)
+                pieces[j].extend(range(bornes[0], bornes[-1] + 1))
+        damier.creerPieces(pieces)
+        return damier
+
+    def toFen(self):
+        """
+        Obtient la notation FEN du damier, par exemple "W:W31,32,K45:B1,2"
+        """
+        (pionsNoirs, pionsBlancs, damesNoires, damesBlanches) = self.getPositionsPieces()
+        sections = ["W" if self.prochainMouvement == Couleur.BLANC else "B"]
+        for (lettre, pions, dames) in (("W", pionsBlancs, damesBlanches), ("B", pionsNoirs, damesNoires)):
+            elements = ["{:d}".format(position) for position in pions] + \
+                ["K{:d}".format(position) for position in dames]
+            elements.sort(key=lambda element: int(element.lstrip("K")))
+            sections.append(lettre + ",".join(elements))
+        return ":".join(sections)
+
     def creerPieces(self, pieces):
         """
         Ajoute sur le damier des pièces données
@@ -255,6 +536,25 @@ class Damier:
         self.creerPionsParCouleur(pionsNoirs, pionsBlancs)
         self.creerDamesParCouleur(damesNoires, damesBlanches)
 
+    def getPositionsPieces(self):
+        """
+        Obtient les positions des pièces, dans le format accepté par
+        "creerPieces"
+
+        @return positions des pions noirs, pions blancs, dames noires, dames
+        blanches (chaque liste est triée)
+        """
+        result = [[], [], [], []]
+        for position in range(1, PositionsDamier.getNombrePositions() + 1):
+            piece = self._cases[position]
+            if piece is None:
+                continue
+            i = 0 if piece.couleur == Couleur.NOIR else 1
+            if piece.typePiece == TypePiece.DAME:
+                i = i + 2
+            result[i].append(position)
+        return result
+
     def creerPionsParCouleur(self, positionsNoires, positionsBlanches):
         """
         Crée des pions noirs et blancs
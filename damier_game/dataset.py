@@ -0,0 +1,163 @@
+import os
+import struct
+
+from .codec_position import CodecPosition
+from .constants import Couleur
+
+
+class ResultatPartie:
+    """ résultat d'une partie, du point de vue des blancs """
+    GAIN_BLANC = 1
+    NUL = 0
+    GAIN_NOIR = -1
+    INCONNU = -128
+
+    @staticmethod
+    def depuisPdn(resultat):
+        """
+        Convertit un résultat PDN ("2-0", "1-1", "0-2", "*")
+        """
+        if resultat == "2-0":
+            return ResultatPartie.GAIN_BLANC
+        if resultat == "0-2":
+            return ResultatPartie.GAIN_NOIR
+        if resultat in ("1-1", "1/2-1/2"):
+            return ResultatPartie.NUL
+        return ResultatPartie.INCONNU
+
+    @staticmethod
+    def depuisGagnant(gagnant):
+        """
+        Convertit la couleur gagnante (None pour une partie nulle)
+        """
+        if gagnant == Couleur.BLANC:
+            return ResultatPartie.GAIN_BLANC
+        if gagnant == Couleur.NOIR:
+            return ResultatPartie.GAIN_NOIR
+        return ResultatPartie.NUL
+
+
+class DatasetPositions:
+    """
+    Fichier de positions à enregistrements de taille fixe, ouvert en ajout
+    par EcrivainPositions et projeté en mémoire par "lire". Le fichier
+    commence par un en-tête de 16 octets (signature, version, taille d'un
+    enregistrement), suivi des enregistrements:
+
+        plateau   15 octets  code de CodecPosition (cases et trait)
+        trait     1 octet    0 blanc, 1 noir
+        coup      int16      indice du meilleur coup (ou du coup joué) dans
+                             l'ordre canonique des coups possibles (voir
+                             Coup.getIndiceCanonique), -1 si inconnu
+        resultat  int8       ResultatPartie
+    """
+
+    signature = b"DAMIERDS"
+    version = 1
+    _entete = struct.Struct("<8sII")
+    _enregistrement = struct.Struct("<{:d}sBhb".format(CodecPosition.taille))
+    tailleEntete = _entete.size
+    tailleEnregistrement = _enregistrement.size
+
+    @staticmethod
+    def getDtype():
+        """
+        @return le type structuré NumPy d'un enregistrement
+        """
+        import numpy
+        return numpy.dtype([("plateau", numpy.uint8, (CodecPosition.taille,)),
+                            ("trait", numpy.uint8),
+                            ("coup", "<i2"),
+                            ("resultat", numpy.int8)])
+
+    @staticmethod
+    def lire(nomFichier):
+        """
+        Projette un fichier de positions en mémoire, sans copie
+
+        @param nomFichier
+        chemin du fichier
+        @return un tableau structuré NumPy (numpy.memmap) en lecture seule,
+        un élément par enregistrement
+        """
+        import numpy
+        with open(nomFichier, "rb") as fichier:
+            DatasetPositions.verifierEntete(fichier.read(DatasetPositions.tailleEntete))
+        taille = os.path.getsize(nomFichier) - DatasetPositions.tailleEntete
+        nombre = taille // DatasetPositions.tailleEnregistrement
+        if nombre == 0:
+            return numpy.zeros(0, dtype=DatasetPositions.getDtype())
+        return numpy.memmap(nomFichier, dtype=DatasetPositions.getDtype(), mode="r",
+                            offset=DatasetPositions.tailleEntete, shape=(nombre,))
+
+    @staticmethod
+    def decoderPlateaux(enregistrements):
+        """
+        Décode les plateaux d'une vue du fichier
+
+        @param enregistrements
+        tableau structuré (ou tranche) renvoyé par "lire"
+        @return liste de couples (cases, trait), voir CodecPosition
+        """
+        return CodecPosition.decoderLot(enregistrements["plateau"].tobytes())
+
+    @staticmethod
+    def verifierEntete(entete):
+        if len(entete) < DatasetPositions.tailleEntete:
+            raise ValueError("Fichier de positions incomplet")
+        (signature, version, taille) = DatasetPositions._entete.unpack(entete)
+        if signature != DatasetPositions.signature or version != DatasetPositions.version \
+                or taille != DatasetPositions.tailleEnregistrement:
+            raise ValueError("Format de fichier de positions inconnu")
+
+
+class EcrivainPositions:
+    """
+    Ajoute des enregistrements à la fin d'un fichier de positions (créé s'il
+    n'existe pas). Les enregistrements déjà écrits ne sont jamais modifiés.
+    """
+
+    def __init__(self, nomFichier):
+        self._fichier = open(nomFichier, "ab")
+        if self._fichier.tell() == 0:
+            self._fichier.write(DatasetPositions._entete.pack(
+                DatasetPositions.signature, DatasetPositions.version,
+                DatasetPositions.tailleEnregistrement))
+        else:
+            with open(nomFichier, "rb") as fichier:
+                DatasetPositions.verifierEntete(fichier.read(DatasetPositions.tailleEntete))
+        self.nombre = 0
+
+    def ajouterCode(self, code, trait, coup=-1, resultat=ResultatPartie.INCONNU):
+        """
+        Ajoute un enregistrement à partir d'un plateau déjà codé
+
+        @param code
+        code de CodecPosition (15 octets)
+        @param trait
+        couleur qui a le trait
+        @param coup
+        indice du coup dans l'ordre canonique des coups possibles (voir
+        Coup.getIndiceCanonique)
+        @param resultat
+        ResultatPartie
+        """
+        self._fichier.write(DatasetPositions._enregistrement.pack(
+            code, 1 if trait == Couleur.NOIR else 0, coup, resultat))
+        self.nombre = self.nombre + 1
+
+    def ajouter(self, damier, coup=-1, resultat=ResultatPartie.INCONNU):
+        """
+        Ajoute la situation de jeu d'un damier
+        """
+        self.ajouterCode(CodecPosition.encoderDamier(damier),
+                         damier.prochainMouvement, coup, resultat)
+
+    def fermer(self):
+        self._fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
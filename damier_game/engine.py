@@ -0,0 +1,594 @@
+import multiprocessing
+import queue
+import time
+
+from .base_finales import BaseFinales, ValeurFinale
+from .constants import Couleur
+from .damier import Damier
+from .ordre_coups import OrdreCoups
+from .table_transposition import TableTransposition, Borne
+
+
+class RechercheInterrompue(Exception):
+    """
+    Déclenchée à l'intérieur de la recherche quand le budget de temps ou de
+    noeuds est épuisé
+    """
+    pass
+
+
+""" moteur propre à chaque processus de calcul, créé à la première tâche """
+_moteurProcessus = None
+
+
+def _rechercherCoup(tache):
+    """
+    Cherche, dans un processus de calcul, le score d'un coup de la racine. Le
+    damier est reconstruit à partir des positions des pièces, avec le moteur
+    d'analyse du damier de la racine, et le coup lui-même est joué.
+
+    Le moteur du processus commence une nouvelle recherche (table de
+    transposition, coups killer et historique) seulement quand le numéro de
+    recherche change: tous les coups d'une même recherche la partagent.
+
+    @param tache
+    tuple (numéro de la recherche, positions des pièces, trait, moteur
+    d'analyse, coup, profondeur, heure limite (time.monotonic) ou None,
+    noeuds restants, taille de la table de transposition, limite de noeuds
+    de la recherche de quiescence, répertoire des bases de finales ou None)
+    @return le triplet (score ou None si le budget est épuisé, noeuds visités,
+    compteurs de coupures de OrdreCoups.getCompteurs)
+    """
+    global _moteurProcessus
+    (numeroRecherche, pieces, prochainMouvement, moteurAnalyse, coup, profondeur,
+     limiteTemps, noeudsMax, tailleTableMo, noeudsQuiescence, repertoireFinales) = tache
+    if _moteurProcessus is None:
+        _moteurProcessus = Engine(tailleTableMo=tailleTableMo)
+    moteur = _moteurProcessus
+    # la tâche a pu attendre son tour au-delà de l'heure limite
+    if limiteTemps is not None and time.monotonic() >= limiteTemps:
+        return (None, 0, (0, 0, 0, 0))
+    moteur.noeudsQuiescence = noeudsQuiescence
+    if repertoireFinales is None:
+        moteur.finales = None
+    elif moteur.finales is None or moteur.finales.repertoire != repertoireFinales:
+        moteur.finales = BaseFinales(repertoireFinales)
+    if moteur._numeroRecherche != numeroRecherche:
+        moteur.nouvelleRecherche()
+        moteur._numeroRecherche = numeroRecherche
+    moteur.ordre.reinitialiserStatistiques()
+    moteur.initialiserBudget(limiteTemps, noeudsMax)
+
+    damier = Damier(True, prochainMouvement, moteurAnalyse)
+    damier.creerPieces(pieces)
+    damier.make(coup)
+    try:
+        score = -moteur.negamax(damier, profondeur - 1,
+                                -Engine.scoreGain - 1, Engine.scoreGain + 1, 1)
+    except RechercheInterrompue:
+        score = None
+    return (score, moteur._noeuds, moteur.ordre.getCompteurs())
+
+
+class ResultatRecherche:
+    """
+    Résultat d'une recherche: le meilleur coup et les statistiques associées
+    """
+
+    def __init__(self, coup, score, profondeur, noeuds, duree, indice=-1, coupLegal=None,
+                 statistiques=None, entreeLivre=None):
+        """
+        @param coup
+        meilleur coup en notation Manoury (None s'il n'y a pas de coup possible)
+        @param score
+        évaluation du coup, du point de vue de la couleur qui a le trait
+        @param profondeur
+        profondeur de la dernière itération terminée
+        @param noeuds
+        nombre de noeuds visités
+        @param duree
+        durée de la recherche en secondes
+        @param indice
+        indice du meilleur coup dans la liste des coups possibles
+        (Engine.getCoups), -1 s'il n'y a pas de coup possible
+        @param coupLegal
+        le meilleur coup (Coup de Damier.legalMoves), qui peut être joué sans
+        validation avec Mouvement.depuisCoup ou Damier.make
+        @param statistiques
+        compteurs de coupures de la recherche (OrdreCoups.getStatistiques)
+        @param entreeLivre
+        l'EntreeLivre du coup s'il vient du livre d'ouvertures (sans
+        recherche: le score et la profondeur sont 0)
+        """
+        self.coup = coup
+        self.indice = indice
+        self.coupLegal = coupLegal
+        self.score = score
+        self.profondeur = profondeur
+        self.noeuds = noeuds
+        self.duree = duree
+        self.statistiques = statistiques
+        self.entreeLivre = entreeLivre
+
+    @property
+    def noeudsParSeconde(self):
+        if self.duree <= 0:
+            return 0
+        return int(self.noeuds / self.duree)
+
+    def toDict(self):
+        return {
+            "coup": self.coup,
+            "score": self.score,
+            "profondeur": self.profondeur,
+            "noeuds": self.noeuds,
+            "duree": round(self.duree, 3),
+            "noeudsParSeconde": self.noeudsParSeconde,
+            "tauxCoupurePremierCoup": self.statistiques["tauxCoupurePremierCoup"]
+            if self.statistiques is not None else None,
+            "livre": self.entreeLivre is not None
+        }
+
+
+class Engine:
+    """
+    Moteur de recherche: negamax avec élagage alpha-beta et approfondissement
+    itératif, sous un budget de temps (en secondes) et/ou de noeuds. Le
+    damier est parcouru avec Damier.make/unmake et se retrouve inchangé à la
+    fin de la recherche.
+
+    À la profondeur maximale, la recherche continue tant que la couleur qui a
+    le trait doit prendre (recherche de quiescence): une situation au milieu
+    d'un échange n'est évaluée qu'une fois les prises terminées.
+
+    Les situations de jeu qui figurent dans les bases de finales ne sont pas
+    cherchées: leur valeur est lue dans la base. De même, le coup d'une
+    position du livre d'ouvertures est joué sans recherche.
+    """
+
+    """ score d'une partie gagnée, diminué du nombre de demi-coups """
+    scoreGain = 100000
+    """
+    le temps est vérifié tous les "intervalleControle" noeuds: à environ 10000
+    noeuds par seconde, le dépassement reste de l'ordre de 25 ms
+    """
+    intervalleControle = 256
+    """ distance au gain supposée quand la base de finales n'a pas de distances """
+    distanceFinaleInconnue = 500
+
+    def __init__(self, dureeMax=None, noeudsMax=None, profondeurMax=64, tailleTableMo=16,
+                 processus=1, noeudsQuiescence=256, finales=None, livre=None):
+        """
+        @param dureeMax
+        durée maximale de la recherche en secondes (None: sans limite)
+        @param noeudsMax
+        nombre maximal de noeuds (None: sans limite)
+        @param profondeurMax
+        profondeur maximale de l'approfondissement itératif
+        @param tailleTableMo
+        taille de la table de transposition en mégaoctets (0: sans table)
+        @param processus
+        nombre de processus de calcul: au-delà de 1, les coups de la racine
+        sont répartis entre les processus, chacun avec son propre damier et
+        sa propre table; le budget de noeuds s'applique alors à chaque coup
+        @param noeudsQuiescence
+        nombre maximal de noeuds de chaque recherche de quiescence (0: sans
+        quiescence); au-delà, les situations sont évaluées même s'il reste
+        des prises
+        @param finales
+        bases de finales consultées pendant la recherche (BaseFinales, None:
+        sans bases)
+        @param livre
+        livre d'ouvertures consulté avant chaque recherche (LivreOuvertures,
+        None: sans livre)
+        """
+        self.dureeMax = dureeMax
+        self.noeudsMax = noeudsMax
+        self.profondeurMax = profondeurMax
+        self.tailleTableMo = tailleTableMo
+        self.processus = processus
+        self.noeudsQuiescence = noeudsQuiescence
+        self._noeudsQuiescence = 0
+        self.finales = finales
+        self.livre = livre
+        self._pool = None
+        self._noeuds = 0
+        self._limiteTemps = None
+        self._limiteNoeuds = None
+        self._numeroRecherche = 0
+        self.table = None
+        if tailleTableMo > 0:
+            self.table = TableTransposition(tailleTableMo)
+        self.ordre = OrdreCoups(profondeurMax + 1)
+
+    def fermer(self):
+        """
+        Arrête les processus de calcul
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def getCoups(self, damier):
+        """
+        Obtient la liste des coups possibles, sans doublons (Damier.legalMoves)
+        """
+        return damier.legalMoves()
+
+    def evaluer(self, damier):
+        """
+        Évalue statiquement une situation de jeu (Damier.evaluation, mise à
+        jour à chaque coup joué ou annulé), du point de vue de la couleur qui
+        a le trait
+        """
+        if damier.prochainMouvement == Couleur.BLANC:
+            return damier.evaluation
+        return -damier.evaluation
+
+    def rechercher(self, damier):
+        """
+        Cherche le meilleur coup pour la couleur qui a le trait
+
+        @param damier
+        la situation de jeu à analyser
+        @return un ResultatRecherche, dont le coup est accepté par Mouvement
+        """
+        self.demarrer(self.dureeMax, self.noeudsMax)
+
+        coupsInitiaux = self.getCoups(damier)
+        if len(coupsInitiaux) == 0:
+            return ResultatRecherche(None, -Engine.scoreGain, 0, 0,
+                                     time.monotonic() - self._debut,
+                                     statistiques=self.getStatistiques())
+        if self.livre is not None:
+            choix = self.livre.choisir(damier, coupsInitiaux)
+            if choix is not None:
+                (coup, entree) = choix
+                indice = coupsInitiaux.index(coup)
+                return ResultatRecherche(coup.getManoury(), 0, 0, 0,
+                                         time.monotonic() - self._debut, indice, coup,
+                                         self.getStatistiques(), entree)
+
+        # copie réordonnée à chaque itération (la liste de legalMoves est
+        # partagée)
+        coups = list(coupsInitiaux)
+
+        meilleurCoup = coups[0]
+        meilleurScore = 0
+        profondeurAtteinte = 0
+        for profondeur in range(1, self.profondeurMax + 1):
+            try:
+                if self.processus > 1:
+                    (score, coup) = self.rechercherRacineParallele(
+                        damier, coupsInitiaux, profondeur)
+                else:
+                    (score, coup) = self.rechercherRacine(
+                        damier, coups, profondeur)
+            except RechercheInterrompue:
+                break
+            meilleurScore = score
+            meilleurCoup = coup
+            profondeurAtteinte = profondeur
+            # le meilleur coup de l'itération précédente est cherché en premier
+            coups.remove(coup)
+            coups.insert(0, coup)
+            # un seul coup possible ou gain forcé trouvé
+            if len(coups) == 1 or abs(score) >= Engine.scoreGain - self.profondeurMax:
+                break
+
+        return ResultatRecherche(meilleurCoup.getManoury(),
+                                 meilleurScore, profondeurAtteinte,
+                                 self._noeuds, time.monotonic() - self._debut,
+                                 coupsInitiaux.index(meilleurCoup), meilleurCoup,
+                                 self.getStatistiques())
+
+    def getStatistiques(self):
+        """
+        Obtient les compteurs de la dernière recherche: coupures beta (voir
+        OrdreCoups.getStatistiques) et, s'il y en a une, remplissage de la
+        table de transposition
+        """
+        result = self.ordre.getStatistiques()
+        if self.table is not None:
+            result["table"] = self.table.getStatistiques()
+        if self.finales is not None:
+            result["finales"] = {"sondages": self.finales.sondages,
+                                 "succes": self.finales.succes}
+        return result
+
+    def demarrer(self, dureeMax, noeudsMax):
+        """
+        Commence une nouvelle recherche: initialise le compteur de noeuds et
+        les limites
+        """
+        debut = time.monotonic()
+        self.initialiserBudget(debut + dureeMax if dureeMax is not None else None, noeudsMax)
+        self._numeroRecherche = self._numeroRecherche + 1
+        self.nouvelleRecherche()
+
+    def initialiserBudget(self, limiteTemps, noeudsMax):
+        """
+        Initialise le compteur de noeuds et les limites
+
+        @param limiteTemps
+        heure limite (time.monotonic), None: sans limite
+        @param noeudsMax
+        nombre maximal de noeuds, None: sans limite
+        """
+        self._debut = time.monotonic()
+        self._noeuds = 0
+        self._limiteTemps = limiteTemps
+        self._limiteNoeuds = noeudsMax
+
+    def nouvelleRecherche(self):
+        """
+        Signale une nouvelle recherche à la table de transposition (âge des
+        entrées) et à l'ordre des coups (killers et historique)
+        """
+        if self.table is not None:
+            self.table.nouvelleRecherche()
+        self.ordre.nouvelleRecherche()
+        if self.finales is not None:
+            self.finales.reinitialiserStatistiques()
+
+    def rechercherRacineParallele(self, damier, coups, profondeur):
+        """
+        Cherche à une profondeur donnée, à la racine, en répartissant les
+        coups entre les processus de calcul. Un coup est envoyé dès qu'un
+        processus est libre, avec une part égale du budget de noeuds encore
+        libre (ce qu'un coup terminé n'a pas utilisé y revient): la recherche
+        ne visite pas plus de noeuds que la recherche sur un seul processus.
+        Dès qu'un coup est interrompu, plus aucun coup n'est envoyé.
+
+        @param coups
+        coups de la racine, dans l'ordre de Damier.analyse
+        @return le couple (score, meilleur coup)
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processus)
+        # l'heure limite est absolue: une tâche qui attend son tour n'a pas
+        # plus de temps qu'une autre
+        if self._limiteTemps is not None and time.monotonic() >= self._limiteTemps:
+            raise RechercheInterrompue()
+        noeudsLibres = None
+        if self._limiteNoeuds is not None:
+            noeudsLibres = self._limiteNoeuds - self._noeuds
+            if noeudsLibres <= 0:
+                raise RechercheInterrompue()
+
+        pieces = damier.getPositionsPieces()
+        repertoireFinales = self.finales.repertoire if self.finales is not None else None
+        # (indice du coup, résultat de _rechercherCoup ou exception), déposés
+        # par le fil de gestion des résultats du pool
+        termines = queue.Queue()
+        resultats = [None] * len(coups)
+        noeudsAlloues = [None] * len(coups)
+        suivant = 0
+        enCours = 0
+        interrompue = False
+        while True:
+            while not interrompue and suivant < len(coups) and enCours < self.processus:
+                if noeudsLibres is not None:
+                    noeudsAlloues[suivant] = max(noeudsLibres, 0) // (len(coups) - suivant)
+                    noeudsLibres = noeudsLibres - noeudsAlloues[suivant]
+                tache = (self._numeroRecherche, pieces, damier.prochainMouvement,
+                         damier.moteurAnalyse, coups[suivant], profondeur,
+                         self._limiteTemps, noeudsAlloues[suivant], self.tailleTableMo,
+                         self.noeudsQuiescence, repertoireFinales)
+                self._pool.apply_async(
+                    _rechercherCoup, (tache,),
+                    callback=lambda resultat, indice=suivant: termines.put((indice, resultat)),
+                    error_callback=lambda erreur, indice=suivant: termines.put((indice, erreur)))
+                suivant = suivant + 1
+                enCours = enCours + 1
+            if enCours == 0:
+                break
+            (indice, resultat) = termines.get()
+            enCours = enCours - 1
+            if isinstance(resultat, BaseException):
+                raise resultat
+            (score, noeuds, compteurs) = resultat
+            resultats[indice] = resultat
+            self._noeuds = self._noeuds + noeuds
+            self.ordre.ajouterCompteurs(compteurs)
+            if noeudsLibres is not None:
+                noeudsLibres = noeudsLibres + noeudsAlloues[indice] - noeuds
+            if score is None:
+                interrompue = True
+        if interrompue:
+            raise RechercheInterrompue()
+
+        meilleurScore = -Engine.scoreGain - 1
+        meilleurCoup = coups[0]
+        for indice in range(len(coups)):
+            score = resultats[indice][0]
+            if score > meilleurScore:
+                meilleurScore = score
+                meilleurCoup = coups[indice]
+        return (meilleurScore, meilleurCoup)
+
+    def rechercherRacine(self, damier, coups, profondeur):
+        """
+        Cherche à une profondeur donnée, à la racine
+
+        @return le couple (score, meilleur coup)
+        """
+        alpha = -Engine.scoreGain - 1
+        beta = Engine.scoreGain + 1
+        meilleurCoup = coups[0]
+        for coup in coups:
+            damier.make(coup)
+            try:
+                score = -self.negamax(damier, profondeur - 1, -beta, -alpha, 1)
+            finally:
+                damier.unmake()
+            if score > alpha:
+                alpha = score
+                meilleurCoup = coup
+        return (alpha, meilleurCoup)
+
+    def negamax(self, damier, profondeur, alpha, beta, ply):
+        """
+        Recherche negamax avec élagage alpha-beta
+
+        @param profondeur
+        profondeur restante
+        @param ply
+        nombre de demi-coups depuis la racine
+        @return le score du point de vue de la couleur qui a le trait
+        """
+        self.compterNoeud()
+        # la valeur d'une finale en base est exacte
+        if self.finales is not None and ply > 0:
+            resultat = self.finales.sonder(damier)
+            if resultat is not None:
+                return Engine.scoreFinale(resultat, ply)
+        # un score mémorisé assez profond peut suffire pour conclure
+        coupTable = -1
+        if self.table is not None and profondeur > 0:
+            cle = damier.cle
+            entree = self.table.sonder(cle)
+            if entree is not None:
+                (profondeurTable, borne, scoreTable, coupTable) = entree
+                if profondeurTable >= profondeur:
+                    scoreTable = Engine.scoreDepuisTable(scoreTable, ply)
+                    if borne == Borne.EXACTE:
+                        return scoreTable
+                    if borne == Borne.INFERIEURE and scoreTable >= beta:
+                        return scoreTable
+                    if borne == Borne.SUPERIEURE and scoreTable <= alpha:
+                        return scoreTable
+
+        coups = self.getCoups(damier)
+        # sans coup possible, la partie est perdue
+        if len(coups) == 0:
+            return -Engine.scoreGain + ply
+        if profondeur <= 0:
+            self._noeudsQuiescence = 0
+            return self.quiescence(damier, coups, alpha, beta, ply)
+
+        # prises, coup mémorisé, coups killer puis historique (OrdreCoups)
+        ordre = self.ordre.ordonner(coups, ply, coupTable)
+
+        alphaOrigine = alpha
+        meilleurScore = -Engine.scoreGain - 1
+        meilleurCoup = -1
+        for (rang, i) in enumerate(ordre):
+            damier.make(coups[i])
+            try:
+                score = -self.negamax(damier, profondeur - 1,
+                                      -beta, -alpha, ply + 1)
+            finally:
+                damier.unmake()
+            if score > meilleurScore:
+                meilleurScore = score
+                meilleurCoup = i
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.ordre.enregistrerCoupure(coups[i], profondeur, ply, rang)
+                break
+
+        if self.table is not None:
+            if meilleurScore >= beta:
+                borne = Borne.INFERIEURE
+            elif meilleurScore <= alphaOrigine:
+                borne = Borne.SUPERIEURE
+            else:
+                borne = Borne.EXACTE
+            self.table.enregistrer(cle, profondeur, borne,
+                                   Engine.scoreVersTable(meilleurScore, ply), meilleurCoup)
+        return meilleurScore
+
+    def quiescence(self, damier, coups, alpha, beta, ply):
+        """
+        Prolonge la recherche par les prises obligatoires: sans prise (ou une
+        fois la limite de noeuds atteinte), la situation est évaluée. La prise
+        étant obligatoire, la couleur qui a le trait ne peut pas s'en tenir à
+        l'évaluation statique quand elle doit prendre.
+
+        @param coups
+        coups possibles de la situation de jeu (Engine.getCoups)
+        @param ply
+        nombre de demi-coups depuis la racine
+        @return le score du point de vue de la couleur qui a le trait
+        """
+        if not coups[0].estCapture or self._noeudsQuiescence >= self.noeudsQuiescence:
+            return self.evaluer(damier)
+
+        meilleurScore = -Engine.scoreGain - 1
+        for coup in coups:
+            damier.make(coup)
+            try:
+                self.compterNoeud()
+                self._noeudsQuiescence = self._noeudsQuiescence + 1
+                suivants = self.getCoups(damier)
+                if len(suivants) == 0:
+                    score = Engine.scoreGain - ply - 1
+                else:
+                    score = -self.quiescence(damier, suivants, -beta, -alpha, ply + 1)
+            finally:
+                damier.unmake()
+            if score > meilleurScore:
+                meilleurScore = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        return meilleurScore
+
+    @staticmethod
+    def scoreFinale(resultat, ply):
+        """
+        Convertit la valeur d'une base de finales en score, comme une partie
+        gagnée ou perdue après "distance" demi-coups
+
+        @param resultat
+        couple (ValeurFinale, distance ou None) de BaseFinales.sonder
+        """
+        (valeur, distance) = resultat
+        if distance is None:
+            distance = Engine.distanceFinaleInconnue
+        if valeur == ValeurFinale.GAIN:
+            return Engine.scoreGain - ply - distance
+        if valeur == ValeurFinale.PERTE:
+            return -Engine.scoreGain + ply + distance
+        return 0
+
+    @staticmethod
+    def scoreVersTable(score, ply):
+        """
+        Les scores de gain sont mémorisés par rapport à la situation de jeu et
+        non par rapport à la racine de la recherche
+        """
+        if score > Engine.scoreGain - 1000:
+            return score + ply
+        if score < -Engine.scoreGain + 1000:
+            return score - ply
+        return score
+
+    @staticmethod
+    def scoreDepuisTable(score, ply):
+        if score > Engine.scoreGain - 1000:
+            return score - ply
+        if score < -Engine.scoreGain + 1000:
+            return score + ply
+        return score
+
+    def compterNoeud(self):
+        """
+        Compte un noeud et interrompt la recherche si le budget est épuisé
+        """
+        self._noeuds = self._noeuds + 1
+        if self._limiteNoeuds is not None and self._noeuds > self._limiteNoeuds:
+            raise RechercheInterrompue()
+        if self._limiteTemps is not None and self._noeuds % Engine.intervalleControle == 0:
+            if time.monotonic() > self._limiteTemps:
+                raise RechercheInterrompue()
@@ -0,0 +1,202 @@
+import argparse
+import random
+import time
+
+from .constants import Couleur, TypePiece
+from .position_damier import PositionsDamier
+
+
+class Evaluation:
+    """
+    Évaluation statique d'une situation de jeu, du point de vue des blancs
+    (positive si les blancs sont mieux placés). Elle est la somme, pour chaque
+    pièce, d'une valeur qui ne dépend que de son type, de sa couleur et de sa
+    position:
+        matériel  valeur d'un pion ou d'une dame
+        tempo     nombre de lignes parcourues par un pion depuis sa ligne de
+                  fond, vers la ligne de promotion (PositionsDamier.estLigneDeFond)
+        centre    pièce sur une des cases du centre du damier
+    La somme est donc mise à jour par le Damier à chaque pièce placée,
+    retirée ou déplacée (Damier.evaluation), sans parcourir les pièces.
+    """
+
+    valeurPion = 100
+    valeurDame = 300
+    """ par ligne parcourue par un pion """
+    valeurTempo = 3
+    """ par pièce sur une case du centre """
+    valeurCentre = 4
+
+    """ lignes et colonnes (numérotées à partir de zéro) du centre du damier """
+    lignesCentre = range(3, 7)
+    colonnesCentre = range(2, 8)
+
+    @staticmethod
+    def construireTables():
+        """
+        Construit les valeurs signées (positives pour les blancs) par (type de
+        pièce, couleur) et par position; l'indice 0 n'est pas utilisé
+        """
+        nombrePositions = PositionsDamier.getNombrePositions()
+        valeurs = {}
+        for couleur in Couleur.all:
+            signe = 1 if couleur == Couleur.BLANC else -1
+            for typePiece in TypePiece.all:
+                valeursPiece = [0] * (nombrePositions + 1)
+                for position in range(1, nombrePositions + 1):
+                    valeur = Evaluation.getValeurMateriel(typePiece)
+                    if typePiece == TypePiece.PION:
+                        valeur = valeur + Evaluation.valeurTempo * \
+                            Evaluation.getAvancement(position, couleur)
+                    if Evaluation.estCentre(position):
+                        valeur = valeur + Evaluation.valeurCentre
+                    valeursPiece[position] = signe * valeur
+                valeurs[(typePiece, couleur)] = valeursPiece
+        Evaluation.valeurs = valeurs
+
+    @staticmethod
+    def getValeurMateriel(typePiece):
+        if typePiece == TypePiece.PION:
+            return Evaluation.valeurPion
+        return Evaluation.valeurDame
+
+    @staticmethod
+    def getAvancement(position, couleur):
+        """
+        Obtient le nombre de lignes qui séparent une position de la ligne de
+        fond d'une couleur (la ligne opposée à sa ligne de promotion)
+        """
+        for promotion in range(1, PositionsDamier.getNombrePositions() + 1):
+            if PositionsDamier.estLigneDeFond(promotion, couleur):
+                distance = abs(PositionsDamier.getNumeroLigne(position) -
+                               PositionsDamier.getNumeroLigne(promotion))
+                return PositionsDamier.lignes - 1 - distance
+        return 0
+
+    @staticmethod
+    def estCentre(position):
+        return PositionsDamier.getNumeroLigne(position) in Evaluation.lignesCentre and \
+            PositionsDamier.getNumeroColonne(position) in Evaluation.colonnesCentre
+
+    @staticmethod
+    def getValeur(typePiece, couleur, position):
+        """
+        @return la valeur signée d'une pièce sur une position (positive pour
+        une pièce blanche)
+        """
+        return Evaluation.valeurs[(typePiece, couleur)][position]
+
+    @staticmethod
+    def calculer(damier):
+        """
+        Calcule l'évaluation en parcourant les pièces du damier (sert de
+        référence à l'évaluation incrémentale Damier.evaluation)
+        """
+        result = 0
+        for piece in damier.pieces:
+            result = result + Evaluation.valeurs[(piece.typePiece, piece.couleur)][piece.position]
+        return result
+
+    @staticmethod
+    def getTermes(damier):
+        """
+        Détaille l'évaluation par terme (blancs moins noirs)
+
+        @return dictionnaire: materiel (pions), dames, tempo, centre
+        """
+        termes = {"materiel": 0, "dames": 0, "tempo": 0, "centre": 0}
+        for piece in damier.pieces:
+            signe = 1 if piece.couleur == Couleur.BLANC else -1
+            if piece.typePiece == TypePiece.PION:
+                termes["materiel"] += signe * Evaluation.valeurPion
+                termes["tempo"] += signe * Evaluation.valeurTempo * \
+                    Evaluation.getAvancement(piece.position, piece.couleur)
+            else:
+                termes["dames"] += signe * Evaluation.valeurDame
+            if Evaluation.estCentre(piece.position):
+                termes["centre"] += signe * Evaluation.valeurCentre
+        return termes
+
+
+Evaluation.construireTables()
+
+
+def _mesurerMakeUnmake(damiers, repetitions, evaluer=None):
+    """
+    Joue et annule chaque coup possible des situations de jeu, comme aux
+    feuilles d'une recherche
+
+    @param evaluer
+    fonction appelée sur le damier après chaque coup (None: sans évaluation)
+    @return la durée en secondes
+    """
+    coups = [damier.legalMoves() for damier in damiers]
+    debut = time.monotonic()
+    for (damier, coupsDamier) in zip(damiers, coups):
+        for i in range(repetitions):
+            for coup in coupsDamier:
+                damier.make(coup)
+                if evaluer is not None:
+                    evaluer(damier)
+                damier.unmake()
+    return time.monotonic() - debut
+
+
+def main(args=None):
+    """
+    Banc d'essai: joue des parties au hasard avec make/unmake et compare, à
+    chaque situation de jeu, l'évaluation incrémentale à l'évaluation
+    calculée depuis les pièces (exactitude), puis mesure make/unmake suivi de
+    chacune des deux évaluations (durée)
+    """
+    # import local: le module damier importe ce module
+    from .damier import Damier
+
+    parser = argparse.ArgumentParser(
+        prog="damier_game.evaluation", description="Compare l'évaluation incrémentale à l'évaluation complète")
+    parser.add_argument("--parties", type=int, default=50, help="nombre de parties jouées au hasard")
+    parser.add_argument("--demi-coups", type=int, default=150, help="nombre maximal de demi-coups par partie")
+    parser.add_argument("--repetitions", type=int, default=10,
+                        help="nombre de make/unmake de chaque coup pour la mesure de durée")
+    parser.add_argument("--graine", type=int, default=1)
+    options = parser.parse_args(args)
+
+    hasard = random.Random(options.graine)
+    damiers = []
+    erreurs = 0
+    for partie in range(options.parties):
+        damier = Damier()
+        joues = 0
+        while joues < options.demi_coups:
+            coups = damier.legalMoves()
+            if len(coups) == 0:
+                break
+            damier.make(hasard.choice(coups))
+            joues = joues + 1
+            if damier.evaluation != Evaluation.calculer(damier):
+                erreurs = erreurs + 1
+            if joues % 10 == 0:
+                damiers.append(damier.toFen())
+        # l'annulation de tous les coups doit ramener l'évaluation initiale
+        for i in range(joues):
+            damier.unmake()
+        if damier.evaluation != Evaluation.calculer(damier):
+            erreurs = erreurs + 1
+
+    damiers = [Damier.depuisFen(fen) for fen in damiers]
+    nombre = sum(len(damier.legalMoves()) for damier in damiers) * options.repetitions
+    dureeSeule = _mesurerMakeUnmake(damiers, options.repetitions)
+    dureeIncrementale = _mesurerMakeUnmake(damiers, options.repetitions,
+                                           lambda damier: damier.evaluation)
+    dureeComplete = _mesurerMakeUnmake(damiers, options.repetitions, Evaluation.calculer)
+
+    print("situations vérifiées: erreurs {:d}".format(erreurs))
+    print("make/unmake: {:d} coups en {:.3f}s".format(nombre, dureeSeule))
+    print("make/unmake et évaluation complète: {:d} coups en {:.3f}s".format(nombre, dureeComplete))
+    print("make/unmake et évaluation incrémentale: {:d} coups en {:.3f}s (x{:.1f})".format(
+        nombre, dureeIncrementale, dureeComplete / dureeIncrementale if dureeIncrementale > 0 else 0))
+    return 0 if erreurs == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
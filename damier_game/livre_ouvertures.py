@@ -0,0 +1,247 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from .constants import Couleur
+from .coup import Coup
+from .dataset import ResultatPartie
+from .pdn import LecteurPdn, RejeuPdn
+
+
+class EntreeLivre(namedtuple("EntreeLivre", ["indice", "parties", "gains", "nulles", "pertes"])):
+    """
+    Coup d'une position du livre d'ouvertures:
+        indice   indice du coup dans l'ordre canonique des coups possibles
+                 (voir Coup.getIndiceCanonique)
+        parties  nombre de parties où le coup a été joué
+        gains    parties gagnées par la couleur qui a joué le coup
+        nulles   parties nulles
+        pertes   parties perdues (les parties au résultat inconnu ne sont
+                 ni gagnées, ni nulles, ni perdues)
+    """
+    __slots__ = ()
+
+    @property
+    def score(self):
+        """
+        @return la proportion de points obtenus par la couleur qui a joué le
+        coup (un gain vaut 1, une nulle 1/2), sur les parties au résultat
+        connu; None si aucun résultat n'est connu
+        """
+        connues = self.gains + self.nulles + self.pertes
+        if connues == 0:
+            return None
+        return (self.gains + self.nulles / 2) / connues
+
+
+class LivreOuvertures:
+    """
+    Livre d'ouvertures: fichier à enregistrements de taille fixe, triés par
+    clé Zobrist de la position (Damier.cle) puis par indice de coup, projeté
+    en mémoire et consulté par recherche dichotomique. Le fichier commence
+    par un en-tête de 16 octets (signature, version, taille d'un
+    enregistrement), suivi des enregistrements:
+
+        cle      uint64  clé Zobrist de la position (pièces et trait)
+        indice   uint16  indice du coup dans l'ordre canonique des coups
+                         possibles (voir Coup.getIndiceCanonique)
+        parties  uint32  nombre de parties où le coup a été joué
+        gains    uint32  voir EntreeLivre
+        nulles   uint32
+        pertes   uint32
+    """
+
+    signature = b"DAMIEROL"
+    version = 1
+    _entete = struct.Struct("<8sII")
+    _enregistrement = struct.Struct("<QHIIII")
+    _cle = struct.Struct("<Q")
+    tailleEntete = _entete.size
+    tailleEnregistrement = _enregistrement.size
+
+    def __init__(self, nomFichier):
+        """
+        @param nomFichier
+        chemin du fichier écrit par ConstructeurLivre
+        """
+        self.nomFichier = nomFichier
+        self._donnees = None
+        self.nombre = 0
+        # positions dont les entrées ne correspondent pas aux coups possibles
+        # (collision de clés Zobrist), voir "choisir"
+        self.collisions = 0
+        with open(nomFichier, "rb") as fichier:
+            entete = fichier.read(LivreOuvertures.tailleEntete)
+            if len(entete) < LivreOuvertures.tailleEntete:
+                raise ValueError("Livre d'ouvertures incomplet")
+            (signature, version, taille) = LivreOuvertures._entete.unpack(entete)
+            if signature != LivreOuvertures.signature or version != LivreOuvertures.version \
+                    or taille != LivreOuvertures.tailleEnregistrement:
+                raise ValueError("Format de livre d'ouvertures inconnu")
+            self.nombre = (os.path.getsize(nomFichier) - LivreOuvertures.tailleEntete) \
+                // LivreOuvertures.tailleEnregistrement
+            if self.nombre > 0:
+                self._donnees = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def fermer(self):
+        if self._donnees is not None:
+            self._donnees.close()
+            self._donnees = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def _getCle(self, i):
+        return LivreOuvertures._cle.unpack_from(
+            self._donnees, LivreOuvertures.tailleEntete + i * LivreOuvertures.tailleEnregistrement)[0]
+
+    def chercher(self, cle):
+        """
+        Cherche les coups d'une position
+
+        @param cle
+        clé Zobrist de la position (Damier.cle)
+        @return la liste des EntreeLivre de la position, par indice de coup
+        (vide si la position n'est pas dans le livre)
+        """
+        # premier enregistrement dont la clé n'est pas inférieure
+        debut = 0
+        fin = self.nombre
+        while debut < fin:
+            milieu = (debut + fin) // 2
+            if self._getCle(milieu) < cle:
+                debut = milieu + 1
+            else:
+                fin = milieu
+        result = []
+        while debut < self.nombre and self._getCle(debut) == cle:
+            (cleEntree, *champs) = LivreOuvertures._enregistrement.unpack_from(
+                self._donnees, LivreOuvertures.tailleEntete + debut * LivreOuvertures.tailleEnregistrement)
+            result.append(EntreeLivre(*champs))
+            debut = debut + 1
+        return result
+
+    def choisir(self, damier, coups=None, partiesMin=1):
+        """
+        Choisit le coup du livre d'une situation de jeu: le plus joué, puis
+        celui de meilleur score
+
+        @param coups
+        coups possibles de la situation (Damier.legalMoves par défaut)
+        @param partiesMin
+        nombre minimal de parties où le coup doit avoir été joué
+        @return le couple (Coup, EntreeLivre) ou None si le livre n'a pas de
+        coup pour la situation
+        """
+        if coups is None:
+            coups = damier.legalMoves()
+        entrees = self.chercher(damier.cle)
+        if len(entrees) == 0:
+            return None
+        # un indice hors des coups possibles signifie que les entrées sont
+        # celles d'une autre position de même clé: aucune n'est utilisée
+        if any(entree.indice >= len(coups) for entree in entrees):
+            self.collisions = self.collisions + 1
+            return None
+        meilleure = None
+        for entree in entrees:
+            if entree.parties < partiesMin:
+                continue
+            if meilleure is None or (entree.parties, entree.score or 0) > \
+                    (meilleure.parties, meilleure.score or 0):
+                meilleure = entree
+        if meilleure is None:
+            return None
+        return (Coup.getOrdreCanonique(coups)[meilleure.indice], meilleure)
+
+
+class ConstructeurLivre:
+    """
+    Construit un livre d'ouvertures à partir de parties rejouées: chaque coup
+    des "demiCoupsMax" premiers demi-coups est compté pour la position où il
+    a été joué, avec le résultat de la partie du point de vue de la couleur
+    qui l'a joué
+    """
+
+    def __init__(self, demiCoupsMax=20):
+        """
+        @param demiCoupsMax
+        nombre de demi-coups retenus au début de chaque partie
+        """
+        self.demiCoupsMax = demiCoupsMax
+        self.parties = 0
+        # (clé Zobrist, indice canonique du coup) -> [parties, gains, nulles,
+        # pertes]
+        self._coups = {}
+
+    def ajouterRejeu(self, rejeu):
+        """
+        Ajoute les coups d'une partie rejouée avec collecte des positions
+        (RejeuPdn.rejouer); seuls les coups valides sont retenus, et une
+        partie sans coup valide (par exemple parce que sa situation de départ
+        est invalide) n'est pas comptée
+
+        @param rejeu
+        un ResultatRejeu
+        """
+        if not rejeu.positions:
+            return
+        resultat = ResultatPartie.depuisPdn(rejeu.partie.resultat)
+        self.parties = self.parties + 1
+        for (code, trait, indice, cle) in rejeu.positions[:self.demiCoupsMax]:
+            compteurs = self._coups.get((cle, indice))
+            if compteurs is None:
+                compteurs = [0, 0, 0, 0]
+                self._coups[(cle, indice)] = compteurs
+            compteurs[0] += 1
+            if resultat == ResultatPartie.INCONNU:
+                continue
+            if resultat == ResultatPartie.NUL:
+                compteurs[2] += 1
+            elif (resultat == ResultatPartie.GAIN_BLANC) == (trait == Couleur.BLANC):
+                compteurs[1] += 1
+            else:
+                compteurs[3] += 1
+
+    def ajouterFichier(self, nomFichier, utiliserMmap=False, processus=1):
+        """
+        Rejoue les parties d'un fichier PDN et ajoute leurs coups
+
+        @return le nombre de parties rejouées
+        """
+        parties = LecteurPdn.lireFichier(nomFichier, utiliserMmap)
+        if processus > 1:
+            rejeux = RejeuPdn.rejouerEnParallele(parties, processus, collecterPositions=True,
+                                                 demiCoupsMax=self.demiCoupsMax)
+        else:
+            rejeux = (RejeuPdn.rejouer(partie, True, self.demiCoupsMax) for partie in parties)
+        nombre = 0
+        for rejeu in rejeux:
+            self.ajouterRejeu(rejeu)
+            nombre = nombre + 1
+        return nombre
+
+    def ecrire(self, nomFichier, partiesMin=1):
+        """
+        Écrit le livre, trié par clé puis par indice de coup
+
+        @param partiesMin
+        nombre minimal de parties pour qu'un coup soit écrit
+        @return le nombre d'enregistrements écrits
+        """
+        result = 0
+        with open(nomFichier, "wb") as fichier:
+            fichier.write(LivreOuvertures._entete.pack(
+                LivreOuvertures.signature, LivreOuvertures.version,
+                LivreOuvertures.tailleEnregistrement))
+            for (cle, indice) in sorted(self._coups):
+                compteurs = self._coups[(cle, indice)]
+                if compteurs[0] < partiesMin:
+                    continue
+                fichier.write(LivreOuvertures._enregistrement.pack(cle, indice, *compteurs))
+                result = result + 1
+        return result
@@ -1,52 +1,139 @@
-from .constants import Couleur
 from .mouvement_unitaire import MouvementUnitaire
 from .damier_exception import DamierException
 from .position_damier import PositionsDamier
+from .constants import Direction
 class Mouvement:
     """
     La classe Mouvement représente un mouvement complet demandé par un joueur. Il
     est constitué d’un enchaînement des mouvements unitaires.
     """
 
-    def __init__(self, damier, mouvementManoury):
+    def __init__(self, damier, mouvementManoury=None, coup=None):
+        """
+        @param damier
+        le damier sur lequel le mouvement est joué
+        @param mouvementManoury
+        le mouvement saisi par un joueur, en notation Manoury (par exemple
+        "32-28" ou "26x37x48")
+        @param coup
+        un Coup généré par le damier (Damier.legalMoves, ou
+        Coup.depuisChemin sur un chemin de Damier.analyse), à la place de la
+        notation: les positions capturées sont connues, "valider" vérifie
+        seulement que le coup fait partie des coups possibles et "execute"
+        joue directement le coup
+        """
+        if coup is not None:
+            mouvementManoury = coup.getManoury()
+            positionsDeplacements = list(coup.chemin)
+        else:
+            try:
+                positionsDeplacements = Mouvement.getPositions(mouvementManoury)
+            except:
+                positionsDeplacements = []
         self.mouvementManoury = mouvementManoury
-        try:
-            positionsDeplacements = Mouvement.getPositions(mouvementManoury)
-        except:
-            positionsDeplacements = []
 
         self.damier = damier
         self.mouvementsUnitaires = Mouvement.creerSegments(
             positionsDeplacements)
+        # coup généré par Damier.legalMoves, pour un mouvement de confiance
+        self.coup = coup
+        if coup is not None:
+            self.completerCaptures(coup.captures)
+
+    @staticmethod
+    def depuisCoup(damier, coup):
+        """
+        Crée un mouvement à partir d'un coup généré par le damier (voir le
+        paramètre "coup" du constructeur)
+
+        @param damier
+        le damier sur lequel le coup a été généré
+        @param coup
+        un Coup
+        """
+        return Mouvement(damier, coup=coup)
+
+    def completerCaptures(self, captures):
+        """
+        Complète les positions capturées des mouvements unitaires: la pièce
+        capturée par chaque mouvement unitaire est la seule pièce du masque
+        des captures entre ses deux positions
+
+        @param captures
+        masque des positions capturées (voir Coup)
+        """
+        for mu in self.mouvementsUnitaires:
+            for direction in Direction.all:
+                rayon = PositionsDamier.getRayon(mu.positionDepart, direction)
+                if mu.positionDestination in rayon:
+                    for position in rayon[:rayon.index(mu.positionDestination)]:
+                        if captures & (1 << (position - 1)):
+                            mu.positionCapturee = position
+                    break
 
     def valider(self):
         """
         Vérifie la validité du mouvement et détermine les causes d’invalidité
         """
+        # un coup généré par le damier est valide s'il fait partie des coups
+        # possibles; sinon il est oublié et vérifié comme un mouvement saisi,
+        # avec les mêmes messages d'erreur
+        if self.coup is not None:
+            if self.coup.cle in [coup.cle for coup in self.damier.legalMoves()]:
+                return
+            self.coup = None
         self.verifierSyntaxe()
         self.verifierPiece()
         self.verifierPositionsValides()
         self.verifierDestinationsLibres()
 
+        # le mouvement est d'abord cherché dans l'arbre des mouvements avec
+        # prise maximale du damier (mémorisé par Damier.analyse)
+        if self.estMouvementMaximal():
+            return
+
+        # sinon, l'analyse complète de la pièce sert à expliquer l'erreur
         mouvementsPossibles = self.getMouvementsPossibles()
         self.verifierMouvementPossible(mouvementsPossibles)
         self.verifierPriseMax()
+        raise DamierException("Le mouvement {} est incomplet".format(self.mouvementManoury))
+
+    def estMouvementMaximal(self):
+        """
+        Cherche le mouvement, de la racine jusqu'à une feuille, dans l'arbre
+        des mouvements possibles avec prise maximale et complète les positions
+        capturées de ses mouvements unitaires
+
+        @return true si le mouvement est possible
+        """
+        mouvementsPossibles = self.damier.analyse()
+        capturees = []
+        for mu in self.mouvementsUnitaires:
+            suivant = None
+            for mouvementPossible in mouvementsPossibles or []:
+                if mouvementPossible.positionDepart == mu.positionDepart and \
+                        mouvementPossible.positionDestination == mu.positionDestination:
+                    suivant = mouvementPossible
+                    break
+            if suivant is None:
+                return False
+            capturees.append(suivant.positionCapturee)
+            mouvementsPossibles = suivant.mouvementsSuivants
+        if mouvementsPossibles:
+            return False
+        for i in range(len(capturees)):
+            self.mouvementsUnitaires[i].positionCapturee = capturees[i]
+        return True
 
     def execute(self):
         """
         Exécute le mouvement (si valide) en déplaçant la pièce puis retirer les
         captures
         """
-        p = self.piece
-        for i in range(len(self.mouvementsUnitaires)):
-            mu = self.mouvementsUnitaires[i]
-            p.deplacer(mu.positionDestination)
-
-        for mu in self.mouvementsUnitaires:
-            if mu.estCapture:
-                self.damier.retirer(mu.positionCapturee)
-        prochainCouleur = Couleur.autre(p.couleur)
-        self.damier.prochainMouvement = prochainCouleur
+        if self.coup is not None:
+            self.damier.make(self.coup)
+        else:
+            self.damier.make(self.mouvementsUnitaires)
 
     def verifierPriseMax(self):
         """
@@ -157,8 +244,12 @@ class Mouvement:
         déclanche une exception si la position est ocuppée
         """
         positions = []
+        # la case de départ est libérée par la pièce déplacée: une dame peut
+        # y revenir au cours d'une prise
+        positionDepart = self.mouvementsUnitaires[0].positionDepart
         for mu in self.mouvementsUnitaires:
-            if not self.damier.estPositionLibre(mu.positionDestination):
+            if mu.positionDestination != positionDepart and \
+                    not self.damier.estPositionLibre(mu.positionDestination):
                 positions.append(mu.positionDestination)
 
         nombrePositionsInvalides = len(positions)
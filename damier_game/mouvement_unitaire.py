@@ -19,6 +19,94 @@ class MouvementUnitaire:
                 mouvements.remove(temp)
         return maxCaptures
 
+    @staticmethod
+    def getChemins(mouvements):
+        """
+        Transforme un arbre de mouvements unitaires en liste de chemins: un
+        chemin est la liste des mouvements unitaires d'un coup complet, de la
+        racine jusqu'à une feuille de l'arbre
+
+        @param mouvements
+        liste des mouvements unitaires (avec leurs continuations)
+        @return la liste des chemins
+        """
+        chemins = []
+        for mu in mouvements:
+            mu.getCheminsSuivants(chemins, [])
+        return chemins
+
+    @staticmethod
+    def depuisChemins(chemins):
+        """
+        Rassemble des chemins en arbre de mouvements unitaires (l'inverse de
+        getChemins). Les chemins qui commencent par les mêmes mouvements
+        unitaires (les mêmes objets) partagent les mêmes noeuds.
+
+        @param chemins
+        itérable de chemins de prise, par exemple genererChemins
+        @return la liste des mouvements unitaires initiaux
+        """
+        mouvements = []
+        for chemin in chemins:
+            suivants = mouvements
+            restants = len(chemin)
+            for mu in chemin:
+                # l'arbre est construit depuis la racine: la prise maximale
+                # vient de la longueur des chemins qui passent par le noeud,
+                # pas des mouvements suivants (voir le setter)
+                if mu._mouvementsSuivants is None:
+                    mu._mouvementsSuivants = []
+                    suivants.append(mu)
+                if restants > mu._priseMax:
+                    mu._priseMax = restants
+                restants = restants - 1
+                suivants = mu._mouvementsSuivants
+        return mouvements
+
+    @staticmethod
+    def genererChemins(position, etapes):
+        """
+        Parcourt en profondeur les prises maximales d'une pièce et produit
+        chaque coup dès qu'il est trouvé. Seule la branche courante est
+        gardée; les coups qui commencent de la même façon partagent les mêmes
+        mouvements unitaires (voir depuisChemins).
+
+        @param position
+        position de départ de la pièce
+        @param etapes
+        étapes de la prise, calculées par Bitboard.getPriseMax ou
+        Piece.getPriseMax: la clé d'une étape est le masque des pièces
+        capturées décalé de 6 bits, plus la position de la pièce; la valeur
+        est le couple (prise maximale, liste des couples (arrivée, position
+        capturée) des prises qui mènent à la prise maximale)
+        @return générateur des coups complets, chacun sous forme de liste de
+        mouvements unitaires
+        """
+        chemin = []
+        # masque des pièces capturées à chaque niveau de la branche
+        masques = [0]
+        # un itérateur des prises maximales par pièce prise
+        pile = [iter(etapes[position][1])]
+        while len(pile) > 0:
+            prise = next(pile[-1], None)
+            if prise is None:
+                pile.pop()
+                masques.pop()
+                if len(chemin) > 0:
+                    chemin.pop()
+                continue
+            (arrivee, positionCapturee) = prise
+            capturees = masques[-1] | (1 << (positionCapturee - 1))
+            depart = chemin[-1].positionDestination if len(chemin) > 0 else position
+            chemin.append(MouvementUnitaire(depart, arrivee, positionCapturee))
+            suivantes = etapes[(capturees << 6) | arrivee][1]
+            if len(suivantes) == 0:
+                yield list(chemin)
+                chemin.pop()
+                continue
+            masques.append(capturees)
+            pile.append(iter(suivantes))
+
     @staticmethod
     def filter(mouvements, startPosition):
         result = []
@@ -35,10 +123,27 @@ class MouvementUnitaire:
         @param mouvementsPossibles
         """
         variantes = []
-        for mu in mouvementsPossibles:
-            mu.getVariantesManoury(variantes)
+        for chemin in MouvementUnitaire.getChemins(mouvementsPossibles):
+            variantes.append(MouvementUnitaire.getManoury(chemin))
         return variantes
 
+    @staticmethod
+    def getManoury(chemin):
+        """
+        Obtient la representation Manoury d'un coup complet, par exemple
+        "32-28" ou "26x37x48"
+        @param chemin
+            liste des mouvements unitaires du coup
+        """
+        result = "{:d}".format(chemin[0].positionDepart)
+        for mu in chemin:
+            if mu.estCapture:
+                sep = "x"
+            else:
+                sep = "-"
+            result = result + "{}{:d}".format(sep, mu.positionDestination)
+        return result
+
     @property
     def positionDepart(self):
         return self._positionDepart
@@ -54,6 +159,7 @@ class MouvementUnitaire:
     @positionCapturee.setter
     def positionCapturee(self, value):
         self._positionCapturee = value
+        self._priseMax = self.calculerPriseMax()
 
     @property
     def mouvementsSuivants(self):
@@ -61,7 +167,13 @@ class MouvementUnitaire:
 
     @mouvementsSuivants.setter
     def mouvementsSuivants(self, value):
+        """
+        Les mouvements suivants sont affectés une fois construits (l'arbre est
+        construit depuis les feuilles): la prise maximale est calculée à ce
+        moment, à partir de celle des mouvements suivants.
+        """
         self._mouvementsSuivants = value
+        self._priseMax = self.calculerPriseMax()
 
     @property
     def estCapture(self):
@@ -72,10 +184,19 @@ class MouvementUnitaire:
         self._positionDestination = positionDestination
         self._positionCapturee = positionCapturee
         self._mouvementsSuivants = None
+        self._priseMax = 1 if positionCapturee > 0 else 0
 
     def getPriseMax(self):
         """
-        Obtient le nombre maximal de captures
+        Obtient le nombre maximal de captures, mémorisé à la construction de
+        l'arbre
+        """
+        return self._priseMax
+
+    def calculerPriseMax(self):
+        """
+        Calcule le nombre maximal de captures à partir de celui des mouvements
+        suivants
         """
         # si pas de pièce capturée, le nombre de prises = 0
         if self.positionCapturee <= 0:
@@ -83,8 +204,7 @@ class MouvementUnitaire:
 
         result = 1
         maxCapturesMouvementsSuivants = 0
-        # on retrouve le nombre max de captures dans l'arbre des mouvements
-        # suivants (maxCapturesMouvementsSuivants)
+        # on retrouve le nombre max de captures des mouvements suivants
         if not self.mouvementsSuivants is None:
             for suivant in self.mouvementsSuivants:
                 capturesSuivantes = suivant.getPriseMax()
@@ -93,31 +213,20 @@ class MouvementUnitaire:
         result = result + maxCapturesMouvementsSuivants
         return result
 
-    def getVariantesManoury(self, variantes, prefix=""):
+    def getCheminsSuivants(self, chemins, prefix):
         """
-        Obtient la liste des variantes sous forme Manoury
-        @param variantes
-            liste à remplir avec les variantes possibles
+        Rajoute à une liste les chemins qui passent par ce mouvement unitaire
+        @param chemins
+            liste à remplir avec les chemins
         @param prefix
-            mémorise les segments précédents concaténés en format Manoury
+            mouvements unitaires précédents
         """
-        if self.estCapture:
-            sep = "x"
-        else:
-            sep = "-"
-        if prefix == "":
-            prefix = "{:d}{}{:d}".format(
-                self.positionDepart, sep, self.positionDestination)
-        else:
-            prefix = prefix + "{}{:d}".format(sep, self.positionDestination)
-
-        # quand on ne peut plus descendre dans l'arbre (plus de mouvements
-        # suivants, le prefix devient une variante
+        chemin = prefix + [self]
         if self.mouvementsSuivants is None or len(self.mouvementsSuivants) == 0:
-            variantes.add(prefix)
+            chemins.append(chemin)
         else:
             for ms in self.mouvementsSuivants:
-                ms.getVariantesManoury(prefix, variantes)
+                ms.getCheminsSuivants(chemins, chemin)
 
     def toString(self, indent=0):
         """
@@ -0,0 +1,140 @@
+from array import array
+
+from .position_damier import PositionsDamier
+
+
+class OrdreCoups:
+    """
+    Ordre dans lequel la recherche essaie les coups d'une situation de jeu:
+    l'élagage alpha-beta coupe d'autant plus tôt que le meilleur coup est
+    essayé en premier. Les coups sont classés par:
+        - nombre de pièces prises (décroissant)
+        - coup mémorisé dans la table de transposition
+        - coups "killer": deux coups sans prise par demi-coup depuis la racine
+          qui ont provoqué une coupure dans une autre branche
+        - historique: score par case de départ et case d'arrivée, augmenté à
+          chaque coupure d'un coup sans prise
+    Les compteurs de coupures permettent de vérifier l'efficacité de l'ordre
+    (proportion de coupures obtenues dès le premier coup).
+    """
+
+    """ nombre de coups killer mémorisés par demi-coup """
+    nombreKillers = 2
+
+    def __init__(self, plyMax=128):
+        """
+        @param plyMax
+        nombre maximal de demi-coups depuis la racine
+        """
+        self._cases = PositionsDamier.getNombrePositions() + 1
+        self._killers = [[None] * OrdreCoups.nombreKillers for ply in range(plyMax)]
+        self._historique = array('l', bytes(array('l').itemsize * self._cases * self._cases))
+        self.reinitialiserStatistiques()
+
+    def reinitialiserStatistiques(self):
+        self.noeuds = 0
+        self.coupures = 0
+        self.coupuresPremierCoup = 0
+        self.sommeRangs = 0
+
+    def nouvelleRecherche(self):
+        """
+        Oublie les coups killer et réduit de moitié l'historique: les coupures
+        des recherches précédentes comptent encore, mais moins
+        """
+        for killers in self._killers:
+            for i in range(len(killers)):
+                killers[i] = None
+        for i in range(len(self._historique)):
+            self._historique[i] >>= 1
+        self.reinitialiserStatistiques()
+
+    def ordonner(self, coups, ply, coupTable=-1):
+        """
+        Classe les coups d'une situation de jeu
+
+        @param coups
+        liste des coups (Coup de Damier.legalMoves)
+        @param ply
+        nombre de demi-coups depuis la racine
+        @param coupTable
+        indice du coup mémorisé dans la table de transposition (-1 si aucun)
+        @return la liste des indices des coups, dans l'ordre où les essayer
+        """
+        self.noeuds = self.noeuds + 1
+        if len(coups) <= 1:
+            return range(len(coups))
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        historique = self._historique
+        cases = self._cases
+        cles = []
+        for i in range(len(coups)):
+            coup = coups[i]
+            if i == coupTable:
+                rang = 0
+            elif coup.cle in killers:
+                rang = 1 + killers.index(coup.cle)
+            else:
+                rang = 1 + OrdreCoups.nombreKillers
+            cles.append((-coup.nombreCaptures, rang,
+                         -historique[coup.depart * cases + coup.arrivee], i))
+        cles.sort()
+        return [cle[-1] for cle in cles]
+
+    def enregistrerCoupure(self, coup, profondeur, ply, rang):
+        """
+        Mémorise un coup qui a provoqué une coupure beta
+
+        @param coup
+        le coup
+        @param profondeur
+        profondeur restante de la recherche
+        @param ply
+        nombre de demi-coups depuis la racine
+        @param rang
+        rang du coup dans l'ordre des coups essayés (0 pour le premier)
+        """
+        self.coupures = self.coupures + 1
+        self.sommeRangs = self.sommeRangs + rang
+        if rang == 0:
+            self.coupuresPremierCoup = self.coupuresPremierCoup + 1
+        if coup.estCapture:
+            return
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != coup.cle:
+                killers[1:] = killers[:-1]
+                killers[0] = coup.cle
+        self._historique[coup.depart * self._cases + coup.arrivee] += profondeur * profondeur
+
+    def ajouterCompteurs(self, compteurs):
+        """
+        Ajoute les compteurs d'une autre recherche (processus de calcul)
+
+        @param compteurs
+        tuple renvoyé par getCompteurs
+        """
+        (noeuds, coupures, coupuresPremierCoup, sommeRangs) = compteurs
+        self.noeuds = self.noeuds + noeuds
+        self.coupures = self.coupures + coupures
+        self.coupuresPremierCoup = self.coupuresPremierCoup + coupuresPremierCoup
+        self.sommeRangs = self.sommeRangs + sommeRangs
+
+    def getCompteurs(self):
+        return (self.noeuds, self.coupures, self.coupuresPremierCoup, self.sommeRangs)
+
+    def getStatistiques(self):
+        """
+        @return les compteurs de coupures: noeuds ordonnés, coupures, coupures
+        au premier coup, proportion de coupures au premier coup et rang moyen
+        du coup qui coupe
+        """
+        return {
+            "noeuds": self.noeuds,
+            "coupures": self.coupures,
+            "coupuresPremierCoup": self.coupuresPremierCoup,
+            "tauxCoupurePremierCoup": round(self.coupuresPremierCoup / self.coupures, 4)
+            if self.coupures > 0 else 0,
+            "rangMoyenCoupure": round(self.sommeRangs / self.coupures, 3)
+            if self.coupures > 0 else 0
+        }
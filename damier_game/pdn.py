@@ -0,0 +1,362 @@
+import collections
+import mmap
+import multiprocessing
+import re
+
+from .codec_position import CodecPosition
+from .coup import Coup
+from .damier import Damier
+from .damier_exception import DamierException
+from .mouvement_unitaire import MouvementUnitaire
+
+
+""" une balise PDN: [Nom "valeur"] """
+_BALISE = re.compile(rb'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+
+""" les éléments du texte des coups, reconnus en une seule passe par ligne """
+_JETONS = re.compile(rb'''
+      (?P<commentaire>\{)
+    | (?P<finCommentaire>\})
+    | (?P<variante>\()
+    | (?P<finVariante>\))
+    | (?P<numero>\d+\.(?:\.\.)?)
+    | (?P<resultat>(?:2-0|0-2|1-1|0-0|1/2-1/2)(?![\dx-])|\*)
+    | (?P<coup>\d+(?:[-x]\d+)+)
+''', re.VERBOSE)
+
+_POSITIONS = re.compile(r'\d+')
+
+
+class PartiePdn:
+    """
+    Partie lue dans un fichier PDN (Portable Draughts Notation)
+    """
+
+    def __init__(self, numero, balises, coups, resultat):
+        """
+        @param numero
+        numéro de la partie dans le fichier (à partir de 1)
+        @param balises
+        dictionnaire des balises ("Event", "White", "FEN", ...)
+        @param coups
+        liste des coups, tels qu'écrits dans le fichier ("32-28", "28x19"...)
+        @param resultat
+        résultat ("2-0", "1-1", "0-2", "*") ou None s'il est absent
+        """
+        self.numero = numero
+        self.balises = balises
+        self.coups = coups
+        self.resultat = resultat
+
+
+class LecteurPdn:
+    """
+    Lecture en flux d'un fichier PDN: les parties sont produites une par une
+    par un générateur, la mémoire utilisée ne dépend pas de la taille du
+    fichier. Le texte des coups est découpé par une seule expression régulière
+    par ligne; les commentaires et variantes sont ignorés.
+    """
+
+    @staticmethod
+    def lireFichier(nomFichier, utiliserMmap=False):
+        """
+        Lit les parties d'un fichier PDN
+
+        @param nomFichier
+        chemin du fichier
+        @param utiliserMmap
+        true pour projeter le fichier en mémoire au lieu de le lire par blocs
+        @return générateur de PartiePdn
+        """
+        with open(nomFichier, "rb") as fichier:
+            if utiliserMmap:
+                with mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+                    yield from LecteurPdn.lire(iter(projection.readline, b""))
+            else:
+                yield from LecteurPdn.lire(fichier)
+
+    @staticmethod
+    def lire(lignes):
+        """
+        Découpe une suite de lignes (bytes) en parties
+
+        @param lignes
+        itérable de lignes, par exemple un fichier ouvert en binaire
+        @return générateur de PartiePdn
+        """
+        numero = 0
+        balises = {}
+        coups = []
+        resultat = None
+        # profondeur des commentaires et des variantes, qui peuvent
+        # s'étendre sur plusieurs lignes
+        commentaire = False
+        variantes = 0
+
+        for ligne in lignes:
+            if not commentaire and variantes == 0 and ligne.lstrip().startswith(b"["):
+                # une balise après le texte des coups commence une nouvelle
+                # partie (si le résultat n'a pas été écrit)
+                if len(coups) > 0:
+                    numero = numero + 1
+                    yield PartiePdn(numero, balises, coups, resultat)
+                    balises = {}
+                    coups = []
+                    resultat = None
+                for balise in _BALISE.finditer(ligne):
+                    balises[balise.group(1).decode("utf-8", "replace")] = \
+                        balise.group(2).decode("utf-8", "replace")
+                continue
+
+            for jeton in _JETONS.finditer(ligne):
+                genre = jeton.lastgroup
+                if commentaire:
+                    if genre == "finCommentaire":
+                        commentaire = False
+                    continue
+                if genre == "commentaire":
+                    commentaire = True
+                elif genre == "variante":
+                    variantes = variantes + 1
+                elif genre == "finVariante":
+                    if variantes > 0:
+                        variantes = variantes - 1
+                elif variantes > 0:
+                    continue
+                elif genre == "coup":
+                    coups.append(jeton.group().decode("ascii"))
+                elif genre == "resultat":
+                    resultat = jeton.group().decode("ascii")
+                    numero = numero + 1
+                    yield PartiePdn(numero, balises, coups, resultat)
+                    balises = {}
+                    coups = []
+                    resultat = None
+
+        if len(coups) > 0 or len(balises) > 0:
+            numero = numero + 1
+            yield PartiePdn(numero, balises, coups, resultat)
+
+
+class ResultatRejeu:
+    """
+    Résultat du rejeu d'une partie
+    """
+
+    def __init__(self, partie, damier, coupsJoues, erreur=None):
+        """
+        @param partie
+        la partie rejouée
+        @param damier
+        la situation de jeu après le dernier coup valide
+        @param coupsJoues
+        nombre de coups valides rejoués
+        @param erreur
+        message décrivant le premier coup invalide (None si la partie est
+        valide)
+        """
+        self.partie = partie
+        self.damier = damier
+        self.coupsJoues = coupsJoues
+        self.erreur = erreur
+        # positions rencontrées avant chaque coup rejoué, si elles sont
+        # demandées: tuples (code de CodecPosition, trait, indice du coup
+        # joué dans l'ordre canonique des coups possibles (voir
+        # Coup.getIndiceCanonique), clé Zobrist)
+        self.positions = None
+        # la situation finale est aussi mémorisée sous forme de listes de
+        # positions, qui restent disponibles sans le damier
+        self.pieces = None
+        self.trait = None
+        self.fen = None
+        if damier is not None:
+            self.pieces = damier.getPositionsPieces()
+            self.trait = damier.prochainMouvement
+            self.fen = damier.toFen()
+
+    def detacher(self):
+        """
+        Oublie le damier (pour renvoyer le résultat d'un processus de calcul
+        à un autre); la situation finale reste dans "pieces", "trait" et
+        "fen"
+        @return le résultat lui-même
+        """
+        self.damier = None
+        return self
+
+    @property
+    def estValide(self):
+        return self.erreur is None
+
+    @property
+    def coupInvalide(self):
+        """
+        @return le premier coup invalide tel qu'écrit dans le fichier, ou None
+        """
+        if self.erreur is None or self.coupsJoues >= len(self.partie.coups):
+            return None
+        return self.partie.coups[self.coupsJoues]
+
+
+def _rejouerLot(tache):
+    """
+    Rejoue, dans un processus de calcul, un lot de parties
+
+    @param tache
+    tuple (liste des parties, collecte des positions, nombre maximal de
+    demi-coups)
+    @return la liste des résultats, sans les damiers
+    """
+    (parties, collecterPositions, demiCoupsMax) = tache
+    result = []
+    for partie in parties:
+        result.append(RejeuPdn.rejouer(partie, collecterPositions, demiCoupsMax).detacher())
+    return result
+
+
+class RejeuPdn:
+    """
+    Rejoue les parties PDN sur un damier. Au lieu de valider chaque coup
+    avec Mouvement, le coup est recherché parmi les coups possibles calculés
+    par Damier.analyse puis joué avec Damier.make.
+    """
+
+    @staticmethod
+    def trouverCoup(chemins, positions):
+        """
+        Cherche le coup correspondant à une notation parmi les coups possibles
+
+        @param chemins
+        coups possibles (voir MouvementUnitaire.getChemins)
+        @param positions
+        positions de la notation: départ, éventuelles cases intermédiaires et
+        arrivée (une prise peut être notée seulement par départ et arrivée)
+        @return le chemin trouvé
+        @throws DamierException
+        si aucun coup ne correspond ou si la notation est ambiguë
+        """
+        depart = positions[0]
+        arrivee = positions[-1]
+        intermediaires = positions[1:-1]
+        trouves = []
+        for chemin in chemins:
+            if chemin[0].positionDepart != depart or chemin[-1].positionDestination != arrivee:
+                continue
+            # les cases intermédiaires notées doivent apparaître dans l'ordre
+            if len(intermediaires) > 0:
+                cases = iter([mu.positionDestination for mu in chemin[:-1]])
+                if not all(position in cases for position in intermediaires):
+                    continue
+            trouves.append(chemin)
+
+        if len(trouves) == 0:
+            raise DamierException("Le mouvement {} est invalide".format(
+                "-".join(str(position) for position in positions)))
+        # plusieurs chemins qui prennent les mêmes pièces sont le même coup
+        capturees = set()
+        for chemin in trouves:
+            capturees.add(frozenset(mu.positionCapturee for mu in chemin))
+        if len(capturees) > 1:
+            raise DamierException("Le mouvement {} est ambigu".format(
+                "-".join(str(position) for position in positions)))
+        return trouves[0]
+
+    @staticmethod
+    def creerDamier(partie):
+        """
+        Crée le damier de départ d'une partie: la balise "FEN" si elle est
+        présente, sinon la position initiale
+        """
+        fen = partie.balises.get("FEN")
+        if fen is not None:
+            return Damier.depuisFen(fen)
+        return Damier()
+
+    @staticmethod
+    def rejouer(partie, collecterPositions=False, demiCoupsMax=None):
+        """
+        Rejoue une partie et s'arrête au premier coup invalide
+
+        @param partie
+        la partie lue
+        @param collecterPositions
+        true pour mémoriser dans le résultat ("positions") chaque position
+        rencontrée et l'indice du coup joué, par exemple pour
+        dataset.EcrivainPositions
+        @param demiCoupsMax
+        nombre de demi-coups rejoués au plus (None: toute la partie); les
+        coups suivants ne sont pas vérifiés
+        @return un ResultatRejeu
+        """
+        try:
+            damier = RejeuPdn.creerDamier(partie)
+        except (DamierException, ValueError) as e:
+            # situation initiale invalide: aucune position n'est rencontrée
+            result = ResultatRejeu(partie, None, 0, str(e))
+            result.positions = [] if collecterPositions else None
+            return result
+        coupsJoues = 0
+        positionsJouees = [] if collecterPositions else None
+        erreur = None
+        for coup in partie.coups:
+            if demiCoupsMax is not None and coupsJoues >= demiCoupsMax:
+                break
+            positions = [int(position) for position in _POSITIONS.findall(coup)]
+            chemins = MouvementUnitaire.getChemins(damier.analyse())
+            try:
+                chemin = RejeuPdn.trouverCoup(chemins, positions)
+            except DamierException as e:
+                erreur = "coup {:d} ({}): {}".format(coupsJoues + 1, coup, e)
+                break
+            if collecterPositions:
+                coupJoue = Coup.depuisChemin(chemin, damier.getPiece(chemin[0].positionDepart))
+                positionsJouees.append((CodecPosition.encoderDamier(damier), damier.prochainMouvement,
+                                        Coup.getIndiceCanonique(damier.legalMoves(), coupJoue),
+                                        damier.cle))
+            damier.make(chemin)
+            coupsJoues = coupsJoues + 1
+        result = ResultatRejeu(partie, damier, coupsJoues, erreur)
+        result.positions = positionsJouees
+        return result
+
+    @staticmethod
+    def rejouerEnParallele(parties, processus, tailleLot=64, lotsEnCours=None,
+                           collecterPositions=False, demiCoupsMax=None):
+        """
+        Rejoue des parties en les répartissant entre plusieurs processus. Les
+        résultats sont produits dans l'ordre des parties. Au plus "lotsEnCours"
+        lots sont lus et en attente à un instant donné, la mémoire reste donc
+        bornée quelle que soit la taille de l'archive.
+
+        @param parties
+        itérable de PartiePdn (par exemple LecteurPdn.lireFichier)
+        @param processus
+        nombre de processus de calcul
+        @param tailleLot
+        nombre de parties envoyées ensemble à un processus
+        @param lotsEnCours
+        nombre maximal de lots en attente (par défaut 4 par processus)
+        @param collecterPositions
+        voir "rejouer"
+        @param demiCoupsMax
+        voir "rejouer"
+        @return générateur de ResultatRejeu, sans les damiers
+        """
+        if lotsEnCours is None:
+            lotsEnCours = 4 * processus
+        with multiprocessing.Pool(processus) as pool:
+            enCours = collections.deque()
+            lot = []
+            for partie in parties:
+                lot.append(partie)
+                if len(lot) < tailleLot:
+                    continue
+                enCours.append(pool.apply_async(_rejouerLot, ((lot, collecterPositions, demiCoupsMax),)))
+                lot = []
+                # on attend le plus ancien lot avant d'en lire d'autres
+                if len(enCours) >= lotsEnCours:
+                    yield from enCours.popleft().get()
+            if len(lot) > 0:
+                enCours.append(pool.apply_async(_rejouerLot, ((lot, collecterPositions, demiCoupsMax),)))
+            while len(enCours) > 0:
+                yield from enCours.popleft().get()
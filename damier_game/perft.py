@@ -0,0 +1,228 @@
+import argparse
+import multiprocessing
+import time
+
+from .constants import Couleur, MoteurAnalyse
+from .damier import Damier
+
+
+def _compterCoup(tache):
+    """
+    Compte, dans un processus de calcul, les noeuds qui suivent un coup de
+    départ. Le damier est reconstruit à partir des positions des pièces, avec
+    le moteur d'analyse du damier de départ, et le coup lui-même est joué.
+
+    @param tache
+    tuple (positions des pièces, trait, moteur d'analyse, coup de départ,
+    profondeur)
+    @return le nombre de noeuds
+    """
+    (pieces, prochainMouvement, moteurAnalyse, coup, profondeur) = tache
+    damier = Damier(True, prochainMouvement, moteurAnalyse)
+    damier.creerPieces(pieces)
+    damier.make(coup)
+    return Perft.compter(damier, profondeur - 1)
+
+
+class PositionReference:
+    """
+    Situation de jeu avec les nombres de noeuds attendus pour perft, par
+    profondeur (le premier nombre correspond à la profondeur 1)
+    """
+
+    def __init__(self, nom, pieces, prochainMouvement, noeuds):
+        """
+        @param nom
+        nom de la situation de jeu
+        @param pieces
+        positions des pions noirs, pions blancs, dames noires, dames blanches
+        (voir Damier.creerPieces), None pour la position initiale
+        @param prochainMouvement
+        couleur qui a le trait
+        @param noeuds
+        nombres de noeuds attendus aux profondeurs 1, 2, ...
+        """
+        self.nom = nom
+        self.pieces = pieces
+        self.prochainMouvement = prochainMouvement
+        self.noeuds = noeuds
+
+    def creerDamier(self, moteurAnalyse=MoteurAnalyse.BITBOARD):
+        if self.pieces is None:
+            damier = Damier()
+            damier.moteurAnalyse = moteurAnalyse
+            return damier
+        damier = Damier(True, self.prochainMouvement, moteurAnalyse)
+        damier.creerPieces(self.pieces)
+        return damier
+
+
+class Perft:
+    """
+    Compte les feuilles de l'arbre des coups possibles jusqu'à une profondeur
+    donnée. Une prise multiple compte pour un seul coup et seules les prises
+    maximales sont jouées; plusieurs chemins qui prennent les mêmes pièces
+    pour arriver sur la même case sont un seul coup (Damier.legalMoves). Sert
+    à la fois de vérification du générateur de coups et de mesure de
+    performance.
+    """
+
+    references = [
+        PositionReference("initiale", None, Couleur.BLANC,
+                          [9, 81, 658, 4265, 27117, 167140]),
+        # une dame blanche face à six pions et une dame noires: plusieurs
+        # chemins de prise mènent à la même case avec les mêmes pièces prises
+        # (ils comptent pour un seul coup)
+        PositionReference("dame chemins multiples",
+                          [[8, 9, 19, 24, 37, 39], [], [22], [44]], Couleur.BLANC,
+                          [13, 52, 441, 3127]),
+        PositionReference("dame en bordure",
+                          [[9, 10, 24, 31, 39], [], [41], [36]], Couleur.BLANC,
+                          [5, 28, 266, 2323]),
+        PositionReference("dame depuis la case 5",
+                          [[10, 11, 15, 36, 38, 39, 42], [], [28], [5]], Couleur.BLANC,
+                          [6, 36, 351, 2188]),
+        PositionReference("pions et dames des deux couleurs",
+                          [[12, 13, 18, 19], [31, 32, 36, 41], [47], [3]], Couleur.BLANC,
+                          [3, 33, 363, 3412, 33110]),
+        PositionReference("deux dames contre une dame",
+                          [[18, 28, 29], [33, 34], [5], [38, 46]], Couleur.BLANC,
+                          [6, 7, 55, 335, 2174]),
+    ]
+
+    @staticmethod
+    def compter(damier, profondeur):
+        """
+        Compte les noeuds à une profondeur donnée
+
+        @param damier
+        la situation de jeu de départ, inchangée à la fin du calcul
+        @param profondeur
+        nombre de demi-coups
+        @return le nombre de noeuds
+        """
+        if profondeur <= 0:
+            return 1
+        coups = damier.legalMoves()
+        if profondeur == 1:
+            return len(coups)
+        result = 0
+        for coup in coups:
+            damier.make(coup)
+            result = result + Perft.compter(damier, profondeur - 1)
+            damier.unmake()
+        return result
+
+    @staticmethod
+    def diviser(damier, profondeur, processus=1):
+        """
+        Compte les noeuds à une profondeur donnée, pour chaque coup de départ
+
+        @param processus
+        nombre de processus de calcul: au-delà de 1, les coups de départ sont
+        répartis entre les processus, chacun avec son propre damier
+        @return la liste des couples (coup en notation Manoury, nombre de
+        noeuds)
+        """
+        if processus > 1 and profondeur > 1:
+            return Perft.diviserParallele(damier, profondeur, processus)
+        result = []
+        for coup in damier.legalMoves():
+            damier.make(coup)
+            noeuds = Perft.compter(damier, profondeur - 1)
+            damier.unmake()
+            result.append((coup.getManoury(), noeuds))
+        return result
+
+    @staticmethod
+    def diviserParallele(damier, profondeur, processus):
+        coups = damier.legalMoves()
+        pieces = damier.getPositionsPieces()
+        taches = []
+        for coup in coups:
+            taches.append((pieces, damier.prochainMouvement, damier.moteurAnalyse,
+                           coup, profondeur))
+        with multiprocessing.Pool(processus) as pool:
+            noeuds = pool.map(_compterCoup, taches, chunksize=1)
+        result = []
+        for indice in range(len(coups)):
+            result.append((coups[indice].getManoury(), noeuds[indice]))
+        return result
+
+    @staticmethod
+    def compterParallele(damier, profondeur, processus):
+        """
+        Compte les noeuds à une profondeur donnée en répartissant les coups de
+        départ entre plusieurs processus
+        """
+        if processus <= 1 or profondeur <= 1:
+            return Perft.compter(damier, profondeur)
+        result = 0
+        for (coup, noeuds) in Perft.diviserParallele(damier, profondeur, processus):
+            result = result + noeuds
+        return result
+
+    @staticmethod
+    def verifier(profondeurMax, afficher=print, processus=1,
+                 moteurAnalyse=MoteurAnalyse.BITBOARD):
+        """
+        Compare les nombres de noeuds des situations de référence aux valeurs
+        attendues
+
+        @param profondeurMax
+        profondeur maximale vérifiée
+        @param moteurAnalyse
+        moteur d'analyse des damiers de référence
+        @return true si tous les nombres sont corrects
+        """
+        succes = True
+        for reference in Perft.references:
+            damier = reference.creerDamier(moteurAnalyse)
+            for profondeur in range(1, min(profondeurMax, len(reference.noeuds)) + 1):
+                debut = time.monotonic()
+                noeuds = Perft.compterParallele(damier, profondeur, processus)
+                duree = time.monotonic() - debut
+                attendu = reference.noeuds[profondeur - 1]
+                if noeuds == attendu:
+                    etat = "ok"
+                else:
+                    etat = "ERREUR (attendu {:d})".format(attendu)
+                    succes = False
+                afficher("{} profondeur {:d}: {:d} noeuds en {:.3f}s {}".format(
+                    reference.nom, profondeur, noeuds, duree, etat))
+        return succes
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="damier_game.perft", description="Perft et divide sur la position initiale ou les positions de référence")
+    parser.add_argument("profondeur", type=int, help="nombre de demi-coups")
+    parser.add_argument("--divide", action="store_true",
+                        help="affiche le nombre de noeuds par coup de départ")
+    parser.add_argument("--verifier", action="store_true",
+                        help="vérifie les positions de référence jusqu'à la profondeur donnée")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="nombre de processus de calcul")
+    options = parser.parse_args(args)
+
+    if options.verifier:
+        return 0 if Perft.verifier(options.profondeur, processus=options.jobs) else 1
+
+    damier = Damier()
+    debut = time.monotonic()
+    if options.divide:
+        total = 0
+        for (coup, noeuds) in Perft.diviser(damier, options.profondeur, options.jobs):
+            print("{} {:d}".format(coup, noeuds))
+            total = total + noeuds
+    else:
+        total = Perft.compterParallele(
+            damier, options.profondeur, options.jobs)
+    duree = time.monotonic() - debut
+    vitesse = int(total / duree) if duree > 0 else 0
+    print("noeuds {:d} durée {:.3f}s noeuds/s {:d}".format(total, duree, vitesse))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -99,9 +99,19 @@ class Piece():
                position à laquelle la pièce doit être deplacée
         """
         # sans vérifier la validité du mouvement
+        if not self._damier is None:
+            self._damier.deplacerPiece(self, destination)
         self._position = destination
 
     def analyse(self, garderPriseMaximale, piecesCapturees=[]):
+        # avec prise maximale, seuls les coups complets les plus longs sont
+        # cherchés (genererPrises) puis rassemblés en arbre
+        if garderPriseMaximale:
+            result = MouvementUnitaire.depuisChemins(self.genererPrises())
+            if len(result) == 0:
+                result = self.getDestinationsPossiblesSansCapture()
+            return result
+
         # pour un mouvement unitaire initial la liste des pièces capturées est
         # vide
         if len(piecesCapturees) == 0:
@@ -127,24 +137,84 @@ class Piece():
             piecesCaptureesSuivantes = piecesCapturees.copy()
             # aux pièces déjà capturées on rajoute la nouvelle capture
             piecesCaptureesSuivantes.append(mouvementUnitaire.positionCapturee)
-            # on déplace la pièce sur la nouvelle position
-            self._position = mouvementUnitaire.positionDestination
+            # on déplace la pièce sur la nouvelle position (sans promotion)
+            Piece.deplacer(self, mouvementUnitaire.positionDestination)
             # on continue l'analyse pour trouver les mouvements unitaires
             # suivants
             mouvementUnitaire.mouvementsSuivants = self.analyse(
                 garderPriseMaximale, piecesCaptureesSuivantes)
             # on remet la pièce sur la position de départ
-            self._position = positionDepart
+            Piece.deplacer(self, positionDepart)
 
-        # si on n'a pas pu capturer des pièces, on va rechercher des mouvements sans capture
-        if estMouvementInitial and (len(result) == 0 or not garderPriseMaximale):
+        # sans prise maximale, les mouvements sans capture sont aussi possibles
+        if estMouvementInitial:
             result = result + self.getDestinationsPossiblesSansCapture()
 
-        if garderPriseMaximale:
-            MouvementUnitaire.removeNonMaximal(result)
+        return result
 
+    def getPriseMax(self, etapes):
+        """
+        Calcule, par une recherche en profondeur, le nombre maximal de pièces
+        que peut prendre la pièce. Comme dans Bitboard.getPriseMax, chaque
+        étape (position de la pièce et pièces déjà capturées) n'est parcourue
+        qu'une fois, et seules les prises qui mènent à la prise maximale y
+        sont gardées. La pièce est déplacée pendant la recherche puis remise
+        à sa place.
+
+        @param etapes
+        dictionnaire complété par les étapes parcourues (voir
+        MouvementUnitaire.genererChemins)
+        @return le nombre maximal de pièces prises (0 si la pièce ne peut pas
+        prendre)
+        """
+        positionDepart = self.position
+        try:
+            return self._getPriseMax(etapes, [], 0)
+        finally:
+            Piece.deplacer(self, positionDepart)
+
+    def _getPriseMax(self, etapes, piecesCapturees, capturees):
+        etape = (capturees << 6) | self.position
+        dejaParcourue = etapes.get(etape)
+        if dejaParcourue is not None:
+            return dejaParcourue[0]
+        position = self.position
+        result = 0
+        prisesMaximales = []
+        for mu in self.getDestinationsPossiblesAvecUneCapture(piecesCapturees):
+            # on déplace la pièce sur la nouvelle position (sans promotion)
+            piecesCapturees.append(mu.positionCapturee)
+            Piece.deplacer(self, mu.positionDestination)
+            longueur = 1 + self._getPriseMax(etapes, piecesCapturees,
+                                             capturees | (1 << (mu.positionCapturee - 1)))
+            Piece.deplacer(self, position)
+            piecesCapturees.pop()
+            if longueur > result:
+                result = longueur
+                prisesMaximales = []
+            if longueur == result:
+                prisesMaximales.append((mu.positionDestination, mu.positionCapturee))
+        etapes[etape] = (result, prisesMaximales)
         return result
 
+    def genererPrises(self, etapes=None):
+        """
+        Produit les prises maximales de la pièce au fur et à mesure du
+        parcours des étapes calculées par getPriseMax, sans construire l'arbre
+        des mouvements unitaires ni déplacer la pièce
+
+        @param etapes
+        étapes calculées par getPriseMax (calculées ici si elles ne sont pas
+        fournies)
+        @return générateur des coups complets de prise maximale, chacun sous
+        forme de liste de mouvements unitaires (aucun si la pièce ne peut pas
+        prendre)
+        """
+        if etapes is None:
+            etapes = {}
+            self.getPriseMax(etapes)
+        return MouvementUnitaire.genererChemins(self.position, etapes)
+
     def getDestinationsPossiblesSansCapture(self):
         pass
 
@@ -1,5 +1,6 @@
 from .constants import Direction, TypePiece
 from .piece import Piece
+from .dame import Dame
 from .mouvement_unitaire import MouvementUnitaire
 from .position_damier import PositionsDamier
 
@@ -19,6 +20,17 @@ class Pion(Piece):
         couleur du pion (noir ou blanc)
         """
         super(Pion, self).__init__(couleur)
+        self._dame = None
+
+    def getDame(self):
+        """
+        Obtient la dame qui remplace ce pion en cas de promotion. Elle est
+        créée une seule fois puis réutilisée, ce qui permet de jouer et
+        d'annuler une promotion sans créer de nouvelles pièces.
+        """
+        if self._dame is None:
+            self._dame = Dame(self.couleur)
+        return self._dame
 
     def getDestinationsPossiblesSansCapture(self):
         result = []
@@ -96,11 +108,15 @@ class Pion(Piece):
     def promotion(self):
         """
         Promotion d'un pion en dame
+        @return la dame qui remplace le pion
         """
         d = self.damier
         position = self.position
-        couleur = self.couleur
+        dame = self.getDame()
+        # la dame prend la place du pion dans la liste des pièces
+        d.cederEmplacement(self, dame)
         # on retire le pion depuis le damier
         self.retirer()
-        # on créé une dame à la place du pion, de la même couleur
-        d.creerDame(position, couleur)
+        # on place une dame à la place du pion, de la même couleur
+        dame.placer(d, position)
+        return dame
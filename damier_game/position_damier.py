@@ -11,11 +11,12 @@ class PositionsDamier:
     lignes = 10
     """ nombre initial des lignes de pions, par couleur """
     numeroInitialLignesPionsParCouleur = 4
+    nombrePositions = lignes * colonnes
 
     @staticmethod
     def getNombrePositions():
         """Obtient le nombre de positions sur le damier """
-        return PositionsDamier.lignes * PositionsDamier.colonnes
+        return PositionsDamier.nombrePositions
 
     @staticmethod
     def getPositionsInitiales(couleur):
@@ -54,6 +55,39 @@ class PositionsDamier:
             @return
                 la position voisine ou -1 si on est en bordure du damier
         """
+        if (PositionsDamier.estPositionInvalide(position)):
+            return -1
+        return PositionsDamier.voisines[direction][position]
+
+    @staticmethod
+    def getRayon(position, direction):
+        """
+        Obtient toutes les positions d'une diagonale, à partir d'une position
+        et dans une direction données
+            @param position
+                la position sur le damier
+            @param direction
+                direction de mouvement en diagonale sur le damier
+            @return
+                tuple des positions rencontrées, de la plus proche à la plus
+                éloignée (vide en bordure du damier)
+        """
+        if (PositionsDamier.estPositionInvalide(position)):
+            return ()
+        return PositionsDamier.rayons[direction][position]
+
+    @staticmethod
+    def calculerPositionVoisine(position, direction):
+        """
+        Calcule une position voisine à partir des numéros de ligne (utilisé
+        pour construire la table des positions voisines)
+            @param position
+                la position sur le damier
+            @param direction
+                direction de mouvement en diagonale sur le damier
+            @return
+                la position voisine ou -1 si on est en bordure du damier
+        """
         # si le numéro de ligne est pair
         if direction == Direction.HAUT_GAUCHE:
             result = position - PositionsDamier.colonnes
@@ -67,7 +101,7 @@ class PositionsDamier:
             raise Exception("Cas impossible")
 
         # si le numéro de ligne est impair, une correction est necessaire
-        numeroLigne = PositionsDamier.getNumeroLigne(position)
+        numeroLigne = PositionsDamier.calculerNumeroLigne(position)
         if (Outils.estImpair(numeroLigne)):
             result = result - 1
 
@@ -76,7 +110,7 @@ class PositionsDamier:
             return -1
 
         # calculer le numéro de la ligne voisine
-        numeroLigneVoisine = PositionsDamier.getNumeroLigne(result)
+        numeroLigneVoisine = PositionsDamier.calculerNumeroLigne(result)
         offsetLigne = numeroLigneVoisine - numeroLigne
 
         # la ligne de la position voisine valide se trouve une ligne
@@ -89,7 +123,7 @@ class PositionsDamier:
 
     @staticmethod
     def estPositionValide(position):
-        return (position >= 1) and (position <= PositionsDamier.getNombrePositions())
+        return (position >= 1) and (position <= PositionsDamier.nombrePositions)
 
     @staticmethod
     def estPositionInvalide(position):
@@ -111,19 +145,38 @@ class PositionsDamier:
                 couleur d'une pièce (noir ou blanc)
             @return true si est une ligne de fond
         """
-        # le blanc avance vers le haut, le noir vers le bas
-        if couleur == Couleur.BLANC:
-            directions = Direction.haut
-        else:
-            directions = Direction.bas
-
-        for direction in directions:
-            if (PositionsDamier.getPositionVoisine(position, direction) > 0):
-                return False
-        return True
+        if (PositionsDamier.estPositionInvalide(position)):
+            return False
+        return PositionsDamier.lignesDeFond[couleur][position]
 
     @staticmethod
     def getNumeroLigne(position):
+        """
+        Obtient le numéro de la ligne (la numérotation commence à zéro)
+            @param position
+                la position sur le damier en notation Manoury (entier qui demarre à 1
+            @return
+                numéro de ligne ou -1 si la position est en déhors du damier
+        """
+        if (PositionsDamier.estPositionInvalide(position)):
+            return -1
+        return PositionsDamier.coordonnees[position][0]
+
+    @staticmethod
+    def getNumeroColonne(position):
+        """
+        Obtient le numéro de colonne (la numérotation commence à zéro)
+            @param position
+                la position sur le damier en notation Manoury (entier qui demarre à 1
+            @return
+                numéro colonne ou -1 si la position est en déhors du damier
+        """
+        if (PositionsDamier.estPositionInvalide(position)):
+            return -1
+        return PositionsDamier.coordonnees[position][1]
+
+    @staticmethod
+    def calculerNumeroLigne(position):
         """
         Calcule le numéro de la ligne (la numérotation commence à zéro)
             @param position
@@ -140,7 +193,7 @@ class PositionsDamier:
         return result
 
     @staticmethod
-    def getNumeroColonne(position):
+    def calculerNumeroColonne(position):
         """
         Calcule le numéro de colonne (la numérotation commence à zéro)
             @param position
@@ -153,7 +206,7 @@ class PositionsDamier:
             return -1
         positionAbsolue = position - 1
         result = (positionAbsolue % PositionsDamier.colonnes) * \
-            2 + (PositionsDamier.getNumeroLigne(position) + 1) % 2
+            2 + (PositionsDamier.calculerNumeroLigne(position) + 1) % 2
         return result
 
     @staticmethod
@@ -164,8 +217,60 @@ class PositionsDamier:
 
     @staticmethod
     def getCoords(position):
-        ligne = PositionsDamier.getNumeroLigne(position)
-        if ligne < 0:
+        if (PositionsDamier.estPositionInvalide(position)):
             return None
-        colonne = PositionsDamier.getNumeroColonne(position)
-        return (ligne, colonne)
+        return PositionsDamier.coordonnees[position]
+
+    @staticmethod
+    def construireTables():
+        """
+        Construit les tables consultées par les méthodes de PositionsDamier:
+        positions voisines et diagonales par (position, direction), lignes de
+        fond par couleur et coordonnées (ligne, colonne) par position. Les
+        tables sont indexées par la position Manoury, l'indice 0 n'est pas
+        utilisé.
+        """
+        nombrePositions = PositionsDamier.getNombrePositions()
+        positions = range(1, nombrePositions + 1)
+
+        voisines = {}
+        for direction in Direction.all:
+            voisinesDirection = [-1] * (nombrePositions + 1)
+            for position in positions:
+                voisinesDirection[position] = PositionsDamier.calculerPositionVoisine(
+                    position, direction)
+            voisines[direction] = voisinesDirection
+
+        rayons = {}
+        for direction in Direction.all:
+            rayonsDirection = [()] * (nombrePositions + 1)
+            for position in positions:
+                rayon = []
+                voisine = voisines[direction][position]
+                while voisine > 0:
+                    rayon.append(voisine)
+                    voisine = voisines[direction][voisine]
+                rayonsDirection[position] = tuple(rayon)
+            rayons[direction] = rayonsDirection
+
+        # une ligne de fond n'a plus de voisine dans le sens d'avancement
+        lignesDeFond = {}
+        for couleur in Couleur.all:
+            lignesDeFondCouleur = [False] * (nombrePositions + 1)
+            for position in positions:
+                lignesDeFondCouleur[position] = all(
+                    voisines[direction][position] < 0 for direction in Direction.avancement[couleur])
+            lignesDeFond[couleur] = lignesDeFondCouleur
+
+        coordonnees = [None] * (nombrePositions + 1)
+        for position in positions:
+            coordonnees[position] = (PositionsDamier.calculerNumeroLigne(position),
+                                     PositionsDamier.calculerNumeroColonne(position))
+
+        PositionsDamier.voisines = voisines
+        PositionsDamier.rayons = rayons
+        PositionsDamier.lignesDeFond = lignesDeFond
+        PositionsDamier.coordonnees = coordonnees
+
+
+PositionsDamier.construireTables()
@@ -0,0 +1,149 @@
+from array import array
+
+
+class Borne:
+    """ type de score mémorisé dans la table de transposition """
+    EXACTE = 0
+    """ le score réel est >= au score mémorisé (coupure beta) """
+    INFERIEURE = 1
+    """ le score réel est <= au score mémorisé (aucun coup n'a amélioré alpha) """
+    SUPERIEURE = 2
+
+
+class TableTransposition:
+    """
+    Table de transposition de taille fixe, indexée par la clé Zobrist d'une
+    situation de jeu. Les entrées sont stockées dans des tableaux préalloués
+    (une colonne par champ), la mémoire utilisée ne varie donc pas pendant la
+    recherche.
+
+    La table est découpée en paquets de deux entrées: la première est
+    remplacée seulement par une recherche au moins aussi profonde (ou issue
+    d'une recherche plus récente), la seconde est toujours remplacée.
+    """
+
+    """ nombre d'octets par entrée: clé, profondeur, borne, génération, score, coup """
+    octetsParEntree = 8 + 1 + 1 + 1 + 4 + 2
+
+    def __init__(self, tailleMo=16):
+        """
+        @param tailleMo
+        taille maximale de la table en mégaoctets, arrondie à une puissance de
+        deux de paquets
+        """
+        nombrePaquets = 1
+        while (nombrePaquets * 4) * TableTransposition.octetsParEntree <= tailleMo * 1024 * 1024:
+            nombrePaquets = nombrePaquets * 2
+        self._masque = nombrePaquets - 1
+        self._capacite = 2 * nombrePaquets
+
+        self._cles = array('Q', bytes(8 * self._capacite))
+        self._profondeurs = array('b', bytes(self._capacite))
+        self._bornes = array('b', bytes(self._capacite))
+        self._generations = array('B', bytes(self._capacite))
+        self._scores = array('i', bytes(4 * self._capacite))
+        self._coups = array('h', bytes(2 * self._capacite))
+        self._generation = 0
+        self._occupees = 0
+        self.reinitialiserStatistiques()
+
+    @property
+    def capacite(self):
+        """
+        @return le nombre d'entrées de la table
+        """
+        return self._capacite
+
+    @property
+    def tauxRemplissage(self):
+        """
+        @return la proportion des entrées occupées
+        """
+        return self._occupees / self._capacite
+
+    def reinitialiserStatistiques(self):
+        self.sondages = 0
+        self.succes = 0
+        self.collisions = 0
+        self.ecritures = 0
+
+    def vider(self):
+        """
+        Efface toutes les entrées sans libérer la mémoire
+        """
+        for i in range(self._capacite):
+            self._cles[i] = 0
+        self._occupees = 0
+        self.reinitialiserStatistiques()
+
+    def nouvelleRecherche(self):
+        """
+        Signale le début d'une nouvelle recherche: les entrées des recherches
+        précédentes deviennent remplaçables en priorité
+        """
+        self._generation = (self._generation + 1) & 0xFF
+
+    def sonder(self, cle):
+        """
+        Cherche une situation de jeu dans la table
+
+        @param cle
+        clé Zobrist de la situation de jeu
+        @return le tuple (profondeur, borne, score, coup) ou None
+        """
+        self.sondages = self.sondages + 1
+        i = (cle & self._masque) << 1
+        if self._cles[i] != cle:
+            i = i + 1
+            if self._cles[i] != cle:
+                return None
+        self.succes = self.succes + 1
+        return (self._profondeurs[i], self._bornes[i], self._scores[i], self._coups[i])
+
+    def enregistrer(self, cle, profondeur, borne, score, coup):
+        """
+        Mémorise le résultat de la recherche d'une situation de jeu
+
+        @param cle
+        clé Zobrist de la situation de jeu
+        @param profondeur
+        profondeur de la recherche
+        @param borne
+        type de score (Borne)
+        @param score
+        score de la situation de jeu
+        @param coup
+        indice du meilleur coup dans la liste des coups possibles (-1 si
+        inconnu)
+        """
+        self.ecritures = self.ecritures + 1
+        i = (cle & self._masque) << 1
+        # l'entrée à profondeur préférée est remplacée si elle contient la même
+        # situation, une recherche moins profonde ou une ancienne recherche
+        if not (self._cles[i] == cle or profondeur >= self._profondeurs[i]
+                or self._generations[i] != self._generation):
+            i = i + 1
+        ancienneCle = self._cles[i]
+        if ancienneCle == 0:
+            self._occupees = self._occupees + 1
+        elif ancienneCle != cle:
+            self.collisions = self.collisions + 1
+        self._cles[i] = cle
+        self._profondeurs[i] = profondeur
+        self._bornes[i] = borne
+        self._generations[i] = self._generation
+        self._scores[i] = score
+        self._coups[i] = coup
+
+    def getStatistiques(self):
+        """
+        @return les compteurs de la table, pour la dimensionner
+        """
+        return {
+            "capacite": self._capacite,
+            "sondages": self.sondages,
+            "succes": self.succes,
+            "collisions": self.collisions,
+            "ecritures": self.ecritures,
+            "tauxRemplissage": round(self.tauxRemplissage, 4)
+        }
@@ -0,0 +1,66 @@
+import random
+
+from .constants import Couleur, TypePiece
+from .position_damier import PositionsDamier
+
+
+class Zobrist:
+    """
+    La classe Zobrist fournit les nombres aléatoires de 64 bits qui servent à
+    calculer la clé d'une situation de jeu: la clé est le ou exclusif des
+    nombres de chaque pièce (type, couleur, position) et, si c'est aux noirs
+    de jouer, du nombre associé au trait. Une clé se met donc à jour en
+    O(1) à chaque pièce placée, retirée ou déplacée.
+    """
+
+    """ graine fixe: les clés sont identiques d'un processus à l'autre """
+    graine = 20180401
+
+    @staticmethod
+    def construireTables():
+        generateur = random.Random(Zobrist.graine)
+        nombrePositions = PositionsDamier.getNombrePositions()
+        cles = {}
+        for typePiece in TypePiece.all:
+            for couleur in Couleur.all:
+                clesPiece = [0] * (nombrePositions + 1)
+                for position in range(1, nombrePositions + 1):
+                    clesPiece[position] = generateur.getrandbits(64)
+                cles[(typePiece, couleur)] = clesPiece
+        Zobrist.cles = cles
+        Zobrist.cleTraitNoir = generateur.getrandbits(64)
+
+    @staticmethod
+    def getCle(typePiece, couleur, position):
+        """
+        Obtient le nombre associé à une pièce sur une position
+        """
+        return Zobrist.cles[(typePiece, couleur)][position]
+
+    @staticmethod
+    def getCleTrait(couleur):
+        """
+        Obtient le nombre associé à la couleur qui a le trait
+        """
+        if couleur == Couleur.NOIR:
+            return Zobrist.cleTraitNoir
+        return 0
+
+    @staticmethod
+    def calculer(damier):
+        """
+        Calcule la clé d'un damier à partir de toutes ses pièces (sans
+        utiliser la mise à jour incrémentale)
+
+        @param damier
+        le damier
+        @return la clé de 64 bits
+        """
+        result = Zobrist.getCleTrait(damier.prochainMouvement)
+        for piece in damier.pieces:
+            result ^= Zobrist.getCle(piece.typePiece,
+                                     piece.couleur, piece.position)
+        return result
+
+
+Zobrist.construireTables()
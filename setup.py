@@ -11,7 +11,12 @@ setup(name='damier_game',
       install_requires=[
           'pillow',
       ],
-      console_scripts= ['damier_game=damier_game.command_line:main'],
+      extras_require={
+          'numpy': ['numpy'],
+      },
+      entry_points={
+          'console_scripts': ['damier_game=damier_game.command_line:main'],
+      },
       scripts=['bin/damier_game'],
       package_data={'damier_game': ['img/*.png']},
       zip_safe=False)
\ No newline at end of file
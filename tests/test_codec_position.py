@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from damier_game.codec_position import CodecPosition
+from damier_game.constants import Couleur
+from damier_game.damier import Damier
+from damier_game.perft import Perft
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "NumPy n'est pas installé")
+class TestCodecTableau(unittest.TestCase):
+    """
+    Les codes calculés par lot avec NumPy sont ceux de CodecPosition.encoder,
+    et leur décodage retrouve les cases et le trait
+    """
+
+    def getSituations(self):
+        aleatoire = random.Random(13)
+        situations = [(bytes(50), Couleur.BLANC),
+                      (bytes([CodecPosition.DAME_NOIRE] * 50), Couleur.NOIR),
+                      (CodecPosition.getCases(Damier()), Couleur.BLANC)]
+        for reference in Perft.references:
+            damier = reference.creerDamier()
+            situations.append((CodecPosition.getCases(damier), damier.prochainMouvement))
+        for i in range(500):
+            cases = bytes(aleatoire.randrange(5) for j in range(50))
+            situations.append((cases, aleatoire.choice([Couleur.BLANC, Couleur.NOIR])))
+        return situations
+
+    def test_encoderDecoder(self):
+        situations = self.getSituations()
+        plateaux = numpy.frombuffer(b"".join(cases for (cases, trait) in situations),
+                                    dtype=numpy.uint8).reshape(len(situations), 50)
+        traits = numpy.array([1 if trait == Couleur.NOIR else 0 for (cases, trait) in situations])
+
+        codes = CodecPosition.encoderTableau(plateaux, traits)
+        self.assertEqual(codes.shape, (len(situations), CodecPosition.taille))
+        self.assertEqual(codes.tobytes(), CodecPosition.encoderLot(situations))
+
+        (plateauxDecodes, traitsDecodes) = CodecPosition.decoderTableau(codes)
+        self.assertTrue((plateauxDecodes == plateaux).all())
+        self.assertTrue((traitsDecodes == traits).all())
+
+    def test_lotVide(self):
+        codes = CodecPosition.encoderTableau(numpy.zeros((0, 50), dtype=numpy.int8),
+                                             numpy.zeros(0))
+        self.assertEqual(codes.shape, (0, CodecPosition.taille))
+        (plateaux, traits) = CodecPosition.decoderTableau(codes)
+        self.assertEqual((plateaux.shape, traits.shape), ((0, 50), (0,)))
+
+
+if __name__ == "__main__":
+    unittest.main()
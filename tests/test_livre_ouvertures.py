@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from damier_game.damier import Damier
+from damier_game.livre_ouvertures import ConstructeurLivre, LivreOuvertures
+
+
+class TestConstructeurLivre(unittest.TestCase):
+    """
+    Une partie dont la situation de départ est invalide est ignorée, les
+    coups des parties suivantes sont retenus
+    """
+
+    texte = ('[FEN "X:W31:B1"]\n'
+             '\n'
+             '*\n'
+             '\n'
+             '[Event "valide"]\n'
+             '\n'
+             '1. 32-28 19-23 2. 28x19 14x23 2-0\n')
+
+    def test_situationInvalide(self):
+        with tempfile.TemporaryDirectory() as repertoire:
+            nomPdn = os.path.join(repertoire, "parties.pdn")
+            with open(nomPdn, "w") as fichier:
+                fichier.write(TestConstructeurLivre.texte)
+            nomLivre = os.path.join(repertoire, "livre.bin")
+            constructeur = ConstructeurLivre(demiCoupsMax=2)
+            self.assertEqual(constructeur.ajouterFichier(nomPdn), 2)
+            self.assertEqual(constructeur.parties, 1)
+            self.assertEqual(constructeur.ecrire(nomLivre), 2)
+
+            with LivreOuvertures(nomLivre) as livre:
+                (coup, entree) = livre.choisir(Damier())
+            self.assertEqual(coup.getManoury(), "32-28")
+            self.assertEqual((entree.parties, entree.gains), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
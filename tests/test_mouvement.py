@@ -0,0 +1,132 @@
+import unittest
+
+from damier_game.coup import Coup
+from damier_game.damier import Damier
+from damier_game.damier_exception import DamierException
+from damier_game.mouvement import Mouvement
+from damier_game.perft import Perft
+
+
+def masque(*positions):
+    result = 0
+    for position in positions:
+        result |= 1 << (position - 1)
+    return result
+
+
+def jouer(damier, mouvement):
+    """
+    Valide puis exécute un mouvement
+
+    @return le couple ("fen", situation de jeu obtenue) si le mouvement est
+    valide, ("erreur", message) sinon
+    """
+    try:
+        mouvement.valider()
+    except DamierException as e:
+        return ("erreur", str(e))
+    mouvement.execute()
+    return ("fen", damier.toFen())
+
+
+class TestMouvementDepuisCoup(unittest.TestCase):
+    """
+    Un coup passé à Mouvement (paramètre "coup" ou Mouvement.depuisCoup) doit
+    donner le même résultat que sa notation saisie par un joueur: même
+    situation de jeu s'il est valide, même message d'erreur sinon
+    """
+
+    """ pions noirs en 11, 12, 28 et 39: la prise 44x33x22 est obligatoire """
+    fenPriseMaximale = "W:W7,44:B11,12,28,39"
+    """ prise de trois pièces terminée par une promotion, deux arrivées """
+    fenPromotion = "W:W32,36:B7,17,18,27"
+
+    def getSituations(self):
+        situations = [Damier().toFen(), TestMouvementDepuisCoup.fenPriseMaximale,
+                      TestMouvementDepuisCoup.fenPromotion]
+        for reference in Perft.references:
+            situations.append(reference.creerDamier().toFen())
+        return situations
+
+    def comparer(self, fen, coup):
+        """
+        Joue un coup sur trois damiers identiques: par sa notation, par le
+        constructeur et par Mouvement.depuisCoup
+
+        @return le résultat commun (voir jouer)
+        """
+        damier = Damier.depuisFen(fen)
+        saisi = Mouvement(damier, coup.getManoury())
+        resultat = jouer(damier, saisi)
+
+        damier = Damier.depuisFen(fen)
+        construit = Mouvement(damier, coup=coup)
+        self.assertEqual(construit.mouvementManoury, saisi.mouvementManoury)
+        self.assertEqual(jouer(damier, construit), resultat)
+
+        damier = Damier.depuisFen(fen)
+        self.assertEqual(jouer(damier, Mouvement.depuisCoup(damier, coup)), resultat)
+
+        if resultat[0] == "fen":
+            self.assertEqual(
+                [(mu.positionDepart, mu.positionDestination, mu.positionCapturee)
+                 for mu in construit.mouvementsUnitaires],
+                [(mu.positionDepart, mu.positionDestination, mu.positionCapturee)
+                 for mu in saisi.mouvementsUnitaires])
+        return resultat
+
+    def test_coupsPossibles(self):
+        for fen in self.getSituations():
+            for coup in Damier.depuisFen(fen).legalMoves():
+                with self.subTest(fen=fen, coup=coup.getManoury()):
+                    (etat, valeur) = self.comparer(fen, coup)
+                    self.assertEqual(etat, "fen", valeur)
+
+    def test_coupsInvalides(self):
+        initiale = Damier().toFen()
+        cas = [
+            # case de départ libre
+            (initiale, Coup(24, 29, (24, 29), 0, False)),
+            # pièce de l'adversaire
+            (initiale, Coup(19, 23, (19, 23), 0, False)),
+            # case d'arrivée occupée
+            (initiale, Coup(36, 31, (36, 31), 0, False)),
+            # déplacement impossible
+            (initiale, Coup(32, 23, (32, 23), 0, False)),
+            # prise qui n'est pas maximale
+            (TestMouvementDepuisCoup.fenPriseMaximale,
+             Coup(7, 16, (7, 16), masque(11), False)),
+            # déplacement sans prise alors qu'une prise est obligatoire
+            (TestMouvementDepuisCoup.fenPriseMaximale,
+             Coup(44, 40, (44, 40), 0, False)),
+            # prise incomplète
+            (TestMouvementDepuisCoup.fenPromotion,
+             Coup(32, 12, (32, 21, 12), masque(27, 17), False)),
+        ]
+        for (fen, coup) in cas:
+            with self.subTest(fen=fen, coup=coup.getManoury()):
+                (etat, valeur) = self.comparer(fen, coup)
+                self.assertEqual(etat, "erreur", valeur)
+
+    def test_coupDUneAutreSituation(self):
+        # un coup des noirs joué alors que les blancs ont le trait
+        damier = Damier()
+        damier.make(damier.legalMoves()[0])
+        coup = damier.legalMoves()[0]
+        (etat, valeur) = self.comparer(Damier().toFen(), coup)
+        self.assertEqual(etat, "erreur")
+
+    def test_masqueDeCapturesIncorrect(self):
+        # le chemin est possible mais pas le masque des captures: le coup est
+        # vérifié comme sa notation, qui ne contient pas les captures
+        fen = TestMouvementDepuisCoup.fenPriseMaximale
+        coup = Coup(44, 22, (44, 33, 22), masque(39), False)
+        (etat, valeur) = self.comparer(fen, coup)
+        self.assertEqual(etat, "fen", valeur)
+        damier = Damier.depuisFen(fen)
+        damier.make(damier.legalMoves()[0])
+        self.assertEqual(valeur, damier.toFen())
+
+
+if __name__ == "__main__":
+    unittest.main()
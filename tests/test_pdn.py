@@ -0,0 +1,55 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from damier_game import command_line
+from damier_game.dataset import DatasetPositions
+from damier_game.pdn import LecteurPdn, RejeuPdn
+
+
+class TestRejeuPdn(unittest.TestCase):
+    """
+    Une partie dont la situation de départ est invalide ne doit pas empêcher
+    le rejeu des parties suivantes
+    """
+
+    """ une partie sans situation de départ valide, puis une partie valide """
+    texte = ('[FEN "X:W31:B1"]\n'
+             '\n'
+             '*\n'
+             '\n'
+             '[Event "valide"]\n'
+             '\n'
+             '1. 32-28 19-23 2. 28x19 14x23 *\n')
+
+    def test_situationInvalide(self):
+        parties = list(LecteurPdn.lire(io.BytesIO(TestRejeuPdn.texte.encode())))
+        self.assertEqual(len(parties), 2)
+
+        rejeu = RejeuPdn.rejouer(parties[0], collecterPositions=True)
+        self.assertFalse(rejeu.estValide)
+        self.assertEqual(rejeu.positions, [])
+
+        rejeu = RejeuPdn.rejouer(parties[1], collecterPositions=True)
+        self.assertTrue(rejeu.estValide)
+        self.assertEqual(len(rejeu.positions), 4)
+
+    def test_commandeDataset(self):
+        with tempfile.TemporaryDirectory() as repertoire:
+            nomPdn = os.path.join(repertoire, "parties.pdn")
+            with open(nomPdn, "w") as fichier:
+                fichier.write(TestRejeuPdn.texte)
+            nomDataset = os.path.join(repertoire, "positions.bin")
+            sortie = io.StringIO()
+            with contextlib.redirect_stdout(sortie):
+                code = command_line.main(["pdn", nomPdn, "--dataset", nomDataset])
+            self.assertEqual(code, 1)
+            self.assertEqual(len(sortie.getvalue().splitlines()), 2)
+            taille = os.path.getsize(nomDataset) - DatasetPositions.tailleEntete
+            self.assertEqual(taille, 4 * DatasetPositions.tailleEnregistrement)
+
+
+if __name__ == "__main__":
+    unittest.main()
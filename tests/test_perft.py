@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from damier_game.constants import MoteurAnalyse
+from damier_game.evaluation import Evaluation
+from damier_game.perft import Perft
+from damier_game.zobrist import Zobrist
+
+
+class TestPerft(unittest.TestCase):
+    """
+    Nombres de noeuds des situations de référence, avec les deux moteurs
+    d'analyse
+    """
+
+    profondeur = 3
+
+    def test_verifier(self):
+        for moteurAnalyse in (MoteurAnalyse.BITBOARD, MoteurAnalyse.PIECES):
+            with self.subTest(moteurAnalyse=moteurAnalyse):
+                messages = []
+                self.assertTrue(Perft.verifier(TestPerft.profondeur, messages.append,
+                                               moteurAnalyse=moteurAnalyse),
+                                "\n".join(messages))
+
+    def test_diviserParallele(self):
+        reference = Perft.references[0]
+        for moteurAnalyse in (MoteurAnalyse.BITBOARD, MoteurAnalyse.PIECES):
+            with self.subTest(moteurAnalyse=moteurAnalyse):
+                damier = reference.creerDamier(moteurAnalyse)
+                self.assertEqual(Perft.diviser(damier, TestPerft.profondeur, 2),
+                                 Perft.diviser(damier, TestPerft.profondeur))
+
+
+class TestMakeUnmake(unittest.TestCase):
+    """
+    Parties aléatoires jouées par "make" puis annulées par "unmake": la clé
+    Zobrist et l'évaluation incrémentales restent égales à leur calcul
+    complet, et chaque annulation retrouve la situation de jeu et l'ordre
+    des pièces
+    """
+
+    def getEtat(self, damier):
+        return (damier.toFen(), damier.cle, damier.evaluation, list(damier.pieces))
+
+    def verifierIncremental(self, damier):
+        self.assertEqual(damier.cle, Zobrist.calculer(damier))
+        self.assertEqual(damier.evaluation, Evaluation.calculer(damier))
+
+    def test_allerRetour(self):
+        aleatoire = random.Random(8)
+        for reference in Perft.references:
+            for moteurAnalyse in (MoteurAnalyse.BITBOARD, MoteurAnalyse.PIECES):
+                with self.subTest(reference=reference.nom, moteurAnalyse=moteurAnalyse):
+                    damier = reference.creerDamier(moteurAnalyse)
+                    self.verifierIncremental(damier)
+                    etats = []
+                    for demiCoup in range(60):
+                        coups = damier.legalMoves()
+                        if len(coups) == 0:
+                            break
+                        etats.append(self.getEtat(damier))
+                        damier.make(aleatoire.choice(coups))
+                        self.verifierIncremental(damier)
+                    while len(etats) > 0:
+                        damier.unmake()
+                        self.assertEqual(self.getEtat(damier), etats.pop())
+                        self.verifierIncremental(damier)
+
+
+if __name__ == "__main__":
+    unittest.main()